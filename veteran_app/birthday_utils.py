@@ -0,0 +1,184 @@
+"""Birthday lookup helpers backed by the indexed VeteranMember.birthday_key"""
+import logging
+import random
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+TODAYS_BIRTHDAYS_CACHE_PREFIX = 'todays_birthdays'
+BIRTHDAY_DEBUG_HEADER = 'HTTP_X_BIRTHDAY_DEBUG'
+
+
+def birthday_key_for(date_of_birth):
+    """Encode a date of birth as a sortable MMDD integer (e.g. 14 March -> 314).
+
+    Unlike a plain day-of-year number this stays stable across leap years,
+    so one indexed equality/range lookup serves every birth year.
+    """
+    if not date_of_birth:
+        return None
+    return date_of_birth.month * 100 + date_of_birth.day
+
+
+def _is_leap_year(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def _window_dates_by_key(start, days):
+    """Map each birthday_key in the window to the first date it falls on.
+
+    In non-leap years 29 February birthdays are celebrated on 28 February.
+    """
+    dates_by_key = {}
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        dates_by_key.setdefault(birthday_key_for(day), day)
+        if day.month == 2 and day.day == 28 and not _is_leap_year(day.year):
+            dates_by_key.setdefault(229, day)
+    return dates_by_key
+
+
+def get_upcoming_birthdays(days=7, today=None, per_day_limit=None, queryset=None):
+    """Return approved veterans with a birthday in the next `days` days (today included).
+
+    Uses a single indexed range read on birthday_key, split in two ranges
+    when the window wraps from December into January. Each entry is a dict
+    with 'veteran', 'date', 'age' (the age they turn on that date) and
+    'is_today', ordered by date then name.
+    """
+    from django.db.models import Q
+    from .models import VeteranMember
+
+    today = today or date.today()
+    days = max(1, min(days, 366))
+    dates_by_key = _window_dates_by_key(today, days)
+
+    last_day = today + timedelta(days=days - 1)
+    start_key = birthday_key_for(today)
+    end_key = birthday_key_for(last_day)
+    if 229 in dates_by_key:
+        end_key = max(end_key, 229)
+    if last_day.year == today.year:
+        key_filter = Q(birthday_key__range=(start_key, end_key))
+    else:
+        # Window wraps from December into January
+        key_filter = Q(birthday_key__gte=start_key) | Q(birthday_key__lte=end_key)
+
+    if queryset is None:
+        queryset = VeteranMember.objects.all()
+    members = queryset.filter(key_filter, approved=True).select_related('rank', 'state', 'blood_group')
+
+    entries = []
+    for veteran in members:
+        birthday = dates_by_key.get(veteran.birthday_key)
+        if birthday is None:
+            continue
+        entries.append({
+            'veteran': veteran,
+            'date': birthday,
+            'age': birthday.year - veteran.date_of_birth.year,
+            'is_today': birthday == today
+        })
+    entries.sort(key=lambda entry: (entry['date'], entry['veteran'].name))
+
+    if per_day_limit:
+        per_day = {}
+        limited = []
+        for entry in entries:
+            per_day[entry['date']] = per_day.get(entry['date'], 0) + 1
+            if per_day[entry['date']] <= per_day_limit:
+                limited.append(entry)
+        entries = limited
+    return entries
+
+
+def _birthday_cache():
+    # Shared by all processes, so a save in any of them (web worker, export
+    # worker, management command) invalidates the list everywhere
+    return caches[getattr(settings, 'BIRTHDAY_CACHE_ALIAS', 'default')]
+
+
+def _todays_birthdays_cache_key(day):
+    return f"{TODAYS_BIRTHDAYS_CACHE_PREFIX}_{day.isoformat()}"
+
+
+def _seconds_until_midnight():
+    tomorrow = datetime.combine(date.today() + timedelta(days=1), time.min)
+    return max(int((tomorrow - datetime.now()).total_seconds()), 60)
+
+
+def get_todays_birthdays(today=None):
+    """Return approved veterans whose birthday is today.
+
+    The list is computed once per calendar day and cached until midnight;
+    member saves/deletes drop it through invalidate_birthday_cache().
+    """
+    today = today or date.today()
+    cache_key = _todays_birthdays_cache_key(today)
+    birthdays = _birthday_cache().get(cache_key)
+    if birthdays is None:
+        birthdays = [entry['veteran'] for entry in get_upcoming_birthdays(days=1, today=today)]
+        _birthday_cache().set(cache_key, birthdays, _seconds_until_midnight())
+    return birthdays
+
+
+def invalidate_birthday_cache(today=None):
+    """Drop today's cached birthday list"""
+    _birthday_cache().delete(_todays_birthdays_cache_key(today or date.today()))
+
+
+def birthday_debug_enabled(request):
+    """Decide (once per request) whether the birthday pipeline is instrumented.
+
+    Enabled by the BIRTHDAY_DEBUG setting, or per request by superusers via
+    the X-Birthday-Debug header; BIRTHDAY_DEBUG_SAMPLE_RATE (0.0-1.0) then
+    samples which requests are actually measured.
+    """
+    if hasattr(request, '_birthday_debug'):
+        return request._birthday_debug
+
+    enabled = getattr(settings, 'BIRTHDAY_DEBUG', False)
+    if not enabled and request.META.get(BIRTHDAY_DEBUG_HEADER):
+        user = getattr(request, 'user', None)
+        enabled = bool(user and user.is_superuser)
+    if enabled:
+        enabled = random.random() < getattr(settings, 'BIRTHDAY_DEBUG_SAMPLE_RATE', 1.0)
+
+    request._birthday_debug = enabled
+    return enabled
+
+
+@contextmanager
+def instrument_birthdays(request, stage):
+    """Log query count and timing of a birthday pipeline stage when debugging is enabled.
+
+    Yields a dict the caller can add extra fields to (e.g. result counts).
+    When instrumentation is off this costs nothing beyond the flag check.
+    """
+    probe = {}
+    if not birthday_debug_enabled(request):
+        yield probe
+        return
+
+    from django.db import connection
+
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    start = perf_counter()
+    with connection.execute_wrapper(count_query):
+        yield probe
+    elapsed_ms = (perf_counter() - start) * 1000
+
+    extra = ' '.join(f'{key}={value}' for key, value in probe.items())
+    logger.info(
+        'birthday_pipeline stage=%s path=%s queries=%d time_ms=%.1f %s',
+        stage, request.path, len(queries), elapsed_ms, extra
+    )
@@ -1,26 +1,30 @@
-from datetime import date
 from django.utils import timezone
-from .models import Notification, VeteranMember
+from django.utils.functional import SimpleLazyObject
+from .models import Notification
+from .birthday_utils import get_todays_birthdays
 
-def global_announcements(request):
-    """Add global announcements to all templates"""
-    today = date.today()
-    now = timezone.now()
-    
-    # Get today's birthdays
-    birthdays = VeteranMember.objects.filter(
-        date_of_birth__month=today.month,
-        date_of_birth__day=today.day,
-        approved=True
-    ).select_related('rank', 'state')[:5]
-    
-    # Get active notifications (not expired)
-    notifications = Notification.objects.filter(
+def _active_notifications():
+    """Active notifications that have not expired yet"""
+    return list(Notification.objects.filter(
         is_active=True,
-        expires_at__gte=now
-    ).order_by('-created_at')[:10]
-    
+        expires_at__gte=timezone.now()
+    ).order_by('-created_at')[:10])
+
+def global_announcements(request):
+    """Add global announcements to all templates.
+
+    Both values are lazy: nothing is queried unless a template actually reads
+    global_birthdays or global_notifications. Views decorated with
+    @skip_global_announcements get empty values instead.
+    """
+    if getattr(request, 'skip_global_announcements', False):
+        return {
+            'global_birthdays': [],
+            'global_notifications': []
+        }
+
     return {
-        'global_birthdays': birthdays,
-        'global_notifications': notifications
+        # Today's birthdays (indexed lookup, cached once per calendar day)
+        'global_birthdays': SimpleLazyObject(lambda: get_todays_birthdays()[:5]),
+        'global_notifications': SimpleLazyObject(_active_notifications)
     }
@@ -45,16 +45,14 @@ def validate_state_access(view_func):
         if request.user.is_superuser:
             return view_func(request, *args, **kwargs)
         
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved:
-                raise PermissionDenied("Account not approved")
-            
-            # Add state to kwargs for view access
-            kwargs['user_state'] = user_state
-            return view_func(request, *args, **kwargs)
-        except:
+        if not request.identity.is_state_admin:
             raise PermissionDenied("Invalid state access")
+        if not request.identity.state_approved:
+            raise PermissionDenied("Account not approved")
+        
+        # Add state to kwargs for view access
+        kwargs['user_state'] = request.user.state_profile
+        return view_func(request, *args, **kwargs)
     return wrapper
 
 def require_state_access(state_param='state_id'):
@@ -63,32 +61,42 @@ def require_state_access(state_param='state_id'):
         @wraps(view_func)
         @login_required
         def wrapper(request, *args, **kwargs):
-            from veteran_app.models import State, UserState
+            from veteran_app.models import State
             
             # Get state_id from kwargs
             state_id = kwargs.get(state_param)
             if not state_id:
                 raise PermissionDenied("State ID required")
             
-            try:
-                state = State.objects.get(id=state_id)
-            except State.DoesNotExist:
+            if not State.objects.filter(id=state_id).exists():
                 raise PermissionDenied("Invalid state")
             
             # Superuser can access any state
-            if request.user.is_superuser:
+            identity = request.identity
+            if identity.is_superuser:
                 return view_func(request, *args, **kwargs)
             
             # Check state admin access
-            try:
-                user_state = request.user.state_profile
-                if not user_state.approved:
-                    raise PermissionDenied('Your account is not approved.')
-                if user_state.state != state:
-                    raise PermissionDenied('You do not have permission to access this state.')
-            except UserState.DoesNotExist:
+            if not identity.is_state_admin:
                 raise PermissionDenied('You do not have permission to access state data.')
+            if not identity.state_approved:
+                raise PermissionDenied('Your account is not approved.')
+            if not identity.can_access_state(state_id):
+                raise PermissionDenied('You do not have permission to access this state.')
             
             return view_func(request, *args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+def skip_global_announcements(view_func):
+    """Opt a view out of the global_announcements context processor.
+
+    Use on endpoints that return JSON, files or fragments and never show the
+    announcement bar, so they never pay for the birthday/notification queries.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        request.skip_global_announcements = True
+        return view_func(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,514 @@
+"""Streaming CSV exports and the background export job queue (also runs member imports)"""
+import csv
+import importlib.util
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, transaction
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per database round trip while streaming an export
+EXPORT_CHUNK_SIZE = 2000
+# Export job progress is written back every this many rows
+EXPORT_PROGRESS_EVERY = 500
+
+
+class Echo:
+    """File-like object whose write() just returns the value, so csv.writer yields lines"""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(header, rows):
+    """Yield CSV-encoded lines: the header followed by every row"""
+    writer = csv.writer(Echo())
+    if header:
+        yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def streaming_csv_response(filename, header, rows):
+    """Return a StreamingHttpResponse that writes rows as they are produced.
+
+    `rows` should be a generator (typically over queryset.iterator()) so
+    neither the queryset nor the CSV is ever held in memory in full.
+    """
+    response = StreamingHttpResponse(csv_rows(header, rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Let nginx and similar proxies pass chunks through as they arrive
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+LEDGER_HEADER = ['Date', 'Transaction ID', 'Type', 'Member', 'Amount', 'Method', 'Reference', 'Description']
+
+LEDGER_COLUMNS = (
+    'created_at', 'transaction_id', 'transaction_type', 'veteran__name',
+    'amount', 'payment_method', 'reference_number', 'description',
+)
+
+
+def ledger_rows(transactions):
+    """Yield LEDGER_HEADER-shaped rows for a Transaction queryset.
+
+    Only the exported columns are selected (member name via a join), and
+    rows are fetched EXPORT_CHUNK_SIZE at a time.
+    """
+    from .models import Transaction
+
+    type_labels = dict(Transaction.TRANSACTION_TYPES)
+    method_labels = dict(Transaction.PAYMENT_METHODS)
+    for (created_at, transaction_id, transaction_type, member_name,
+         amount, payment_method, reference_number, description) in transactions.values_list(
+            *LEDGER_COLUMNS).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            created_at.strftime('%Y-%m-%d %H:%M'),
+            transaction_id,
+            type_labels.get(transaction_type, transaction_type),
+            member_name or 'N/A',
+            amount,
+            method_labels.get(payment_method, payment_method),
+            reference_number,
+            description
+        ]
+
+
+def ledger_totals(transactions):
+    """Return {'income', 'expenses', 'net'} for a Transaction queryset in one aggregate query"""
+    from django.db.models import Q, Sum
+
+    totals = transactions.order_by().aggregate(
+        income=Sum('amount', filter=~Q(transaction_type='expense')),
+        expenses=Sum('amount', filter=Q(transaction_type='expense'))
+    )
+    income = totals['income'] or 0
+    expenses = totals['expenses'] or 0
+    return {'income': income, 'expenses': expenses, 'net': income - expenses}
+
+
+def streaming_ledger_response(filename, transactions, preamble=()):
+    """Stream a transaction ledger as CSV, optionally preceded by preamble rows"""
+    def rows():
+        yield from preamble
+        yield LEDGER_HEADER
+        yield from ledger_rows(transactions)
+
+    return streaming_csv_response(filename, None, rows())
+
+
+def build_financial_report(params, chunk_size=EXPORT_CHUNK_SIZE):
+    """Return (header, total_rows, rows, column_types) for the transaction ledger of a date range"""
+    from .models import Transaction
+
+    transactions = Transaction.objects.filter(
+        created_at__date__range=[params['start_date'], params['end_date']]
+    ).order_by('-created_at')
+    column_types = [('string', False)] * len(LEDGER_HEADER)
+    return LEDGER_HEADER, transactions.count(), ledger_rows(transactions), column_types
+
+
+def _report_builders():
+    from .report_utils import build_veteran_report
+    return {'veteran': build_veteran_report, 'financial': build_financial_report}
+
+
+def _report_progress(on_progress, count):
+    if on_progress and count % EXPORT_PROGRESS_EVERY == 0:
+        on_progress(count)
+
+
+def write_csv_export(path, header, rows, column_types=None, on_progress=None):
+    """Write header and rows to a CSV file, reporting progress. Returns rows written."""
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+            _report_progress(on_progress, count)
+    return count
+
+
+def write_xlsx_export(path, header, rows, column_types=None, on_progress=None):
+    """Write an XLSX workbook with openpyxl's write-only mode (rows are streamed, not kept)"""
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+    def cell(value):
+        if isinstance(value, str):
+            return ILLEGAL_CHARACTERS_RE.sub('', value)
+        if isinstance(value, datetime) and timezone.is_aware(value):
+            # Excel has no time zones; write local time
+            return timezone.make_naive(value)
+        return value
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Report')
+    sheet.append(header)
+    count = 0
+    for row in rows:
+        sheet.append([cell(value) for value in row])
+        count += 1
+        _report_progress(on_progress, count)
+    workbook.save(path)
+    return count
+
+
+def _unique_names(header):
+    seen = {}
+    names = []
+    for name in header:
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name} ({seen[name]})")
+    return names
+
+
+def write_parquet_export(path, header, rows, column_types=None, on_progress=None):
+    """Write a Parquet file with pyarrow, one row group per EXPORT_CHUNK_SIZE rows.
+
+    Columns are typed from column_types ((type, nullable) hints); empty
+    cells become nulls, or 0/False for non-nullable numeric and boolean columns.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        'int': pa.int64(), 'bool': pa.bool_(), 'date': pa.date32(),
+        'datetime': pa.timestamp('us', tz='UTC'), 'float': pa.float64(), 'string': pa.string(),
+    }
+    empty_values = {'int': 0, 'bool': False, 'float': 0.0}
+    column_types = column_types or [('string', False)] * len(header)
+    schema = pa.schema([
+        pa.field(name, arrow_types[column_type])
+        for name, (column_type, _) in zip(_unique_names(header), column_types)
+    ])
+
+    def convert(value, column_type, nullable):
+        if value is None or value == '':
+            if column_type == 'string':
+                return '' if value == '' else None
+            return None if nullable else empty_values.get(column_type)
+        if column_type == 'string':
+            return str(value)
+        if column_type == 'float':
+            return float(value)
+        return value
+
+    def flush(batch):
+        columns = [
+            pa.array([convert(row[i], column_type, nullable) for row in batch], type=schema.field(i).type)
+            for i, (column_type, nullable) in enumerate(column_types)
+        ]
+        writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+    count = 0
+    batch = []
+    with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+        for row in rows:
+            batch.append(row)
+            count += 1
+            _report_progress(on_progress, count)
+            if len(batch) >= EXPORT_CHUNK_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    return count
+
+
+# export_format -> label, file extension, writer and the optional package it needs
+EXPORT_FORMATS = {
+    'csv': {'label': 'CSV (Excel Compatible)', 'extension': 'csv', 'writer': write_csv_export, 'requires': None},
+    'xlsx': {'label': 'Excel Workbook (XLSX)', 'extension': 'xlsx', 'writer': write_xlsx_export, 'requires': 'openpyxl'},
+    'parquet': {'label': 'Parquet (for data analysis)', 'extension': 'parquet', 'writer': write_parquet_export, 'requires': 'pyarrow'},
+}
+
+
+def available_export_formats():
+    """[(format, label)] for the formats whose optional package is installed"""
+    return [
+        (key, spec['label']) for key, spec in EXPORT_FORMATS.items()
+        if spec['requires'] is None or importlib.util.find_spec(spec['requires']) is not None
+    ]
+
+
+def enqueue_export(user, report_type, params, export_format='csv', report_config=None, dispatch=True):
+    """Create an ExportJob and hand it to the configured runner.
+
+    If a live export with the same parameters was built from the current
+    data version, its file is reused and the job is completed immediately.
+    With dispatch=False the caller runs the queue itself.
+    """
+    from .models import ExportJob
+    from .report_utils import report_cache_key
+
+    cache_key = report_cache_key(report_type, params, export_format)
+    cached = cache_key and ExportJob.objects.filter(
+        cache_key=cache_key,
+        status=ExportJob.STATUS_COMPLETED,
+        expires_at__gt=timezone.now()
+    ).exclude(file='').order_by('-finished_at').first()
+
+    if cached:
+        now = timezone.now()
+        return ExportJob.objects.create(
+            created_by=user,
+            report_type=report_type,
+            params=params,
+            export_format=export_format,
+            cache_key=cache_key,
+            report_config=report_config,
+            status=ExportJob.STATUS_COMPLETED,
+            total_rows=cached.total_rows,
+            processed_rows=cached.processed_rows,
+            file=cached.file.name,
+            started_at=now,
+            finished_at=now,
+            expires_at=cached.expires_at
+        )
+
+    job = ExportJob.objects.create(
+        created_by=user,
+        report_type=report_type,
+        params=params,
+        export_format=export_format,
+        cache_key=cache_key,
+        report_config=report_config
+    )
+    if dispatch and getattr(settings, 'EXPORT_JOB_RUNNER', 'thread') == 'thread':
+        # Start after commit so the background thread can see the job row
+        transaction.on_commit(start_export_thread)
+    return job
+
+
+class JobInterrupted(Exception):
+    """The job is no longer running (fail_stale_jobs gave up on it); its worker should stop"""
+
+
+def update_running_job(job, **fields):
+    """Write fields of a running job and move its heartbeat forward.
+
+    Raises JobInterrupted if the job is no longer running, so a worker that
+    was only slow stops instead of overwriting the failure.
+    """
+    model = type(job)
+    updated = model.objects.filter(pk=job.pk, status=model.STATUS_RUNNING).update(
+        heartbeat_at=timezone.now(),
+        **fields
+    )
+    if not updated:
+        raise JobInterrupted(f"{model.__name__} {job.pk} is no longer running")
+
+
+def finish_job(job, **fields):
+    """Record the outcome of a running job. Returns False (writing nothing) if it is no longer running."""
+    model = type(job)
+    return bool(model.objects.filter(pk=job.pk, status=model.STATUS_RUNNING).update(**fields))
+
+
+def fail_stale_jobs(model):
+    """Mark running jobs without a heartbeat for EXPORT_JOB_TIMEOUT_MINUTES as failed. Returns jobs failed.
+
+    Only the process that claimed a job finishes it; if that process died
+    (deploy, worker timeout, restart) the job would otherwise stay running.
+    A worker that is still alive notices at its next progress write and
+    stops (see update_running_job). Files of failed jobs are left alone
+    until twice the timeout has passed without a heartbeat.
+    """
+    timeout = timedelta(minutes=getattr(settings, 'EXPORT_JOB_TIMEOUT_MINUTES', 15))
+    now = timezone.now()
+    last_seen = Coalesce('heartbeat_at', 'started_at')
+    stale = model.objects.alias(last_seen=last_seen).filter(
+        status=model.STATUS_RUNNING,
+        last_seen__lt=now - timeout
+    )
+    failed = 0
+    for job_id in stale.values_list('pk', flat=True):
+        marked = model.objects.filter(pk=job_id, status=model.STATUS_RUNNING).update(
+            status=model.STATUS_FAILED,
+            error='The job was interrupted before it finished. Please try again.',
+            finished_at=now
+        )
+        if marked:
+            logger.warning('%s %s had no heartbeat for %s; marked failed', model.__name__, job_id, timeout)
+            failed += 1
+
+    abandoned = model.objects.alias(last_seen=last_seen).filter(
+        status=model.STATUS_FAILED,
+        last_seen__lt=now - 2 * timeout
+    ).exclude(file='')
+    for job in abandoned:
+        job.file.delete(save=False)
+        model.objects.filter(pk=job.pk).update(file='')
+    return failed
+
+
+def claim_next_job(model):
+    """Atomically move the oldest pending job of a job model to running and return it (or None).
+
+    The claim is a conditional UPDATE, so concurrent workers never pick up
+    the same job, on SQLite as well as PostgreSQL. Works for any model with
+    the ExportJob status/started_at/heartbeat_at/finished_at/created_at fields (e.g.
+    ImportJob). Stale running jobs are failed first (see fail_stale_jobs).
+    """
+    fail_stale_jobs(model)
+    pending = model.objects.filter(status=model.STATUS_PENDING).order_by('created_at')
+    for job_id in pending.values_list('pk', flat=True)[:10]:
+        now = timezone.now()
+        claimed = model.objects.filter(pk=job_id, status=model.STATUS_PENDING).update(
+            status=model.STATUS_RUNNING,
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            return model.objects.get(pk=job_id)
+    return None
+
+
+def claim_next_export_job():
+    """Claim the oldest pending ExportJob (see claim_next_job)"""
+    from .models import ExportJob
+
+    return claim_next_job(ExportJob)
+
+
+def run_export_job(job):
+    """Build a claimed job's file, tracking progress; failures are recorded on the job.
+
+    Every write is conditional on the job still running, so a job that
+    fail_stale_jobs gave up on keeps its failure and gets no file.
+    """
+    from .models import ExportJob
+
+    def on_progress(count):
+        update_running_job(job, processed_rows=count)
+
+    tmp_path = None
+    try:
+        builder = _report_builders().get(job.report_type)
+        if builder is None:
+            raise ValueError(f"Unsupported report type: {job.report_type}")
+        if job.export_format not in dict(available_export_formats()):
+            raise ValueError(f"Unsupported export format: {job.export_format}")
+        export_format = EXPORT_FORMATS[job.export_format]
+
+        header, total_rows, rows, column_types = builder(job.params, chunk_size=EXPORT_CHUNK_SIZE)
+        update_running_job(job, total_rows=total_rows)
+        job.total_rows = total_rows
+
+        with tempfile.NamedTemporaryFile(suffix=f".{export_format['extension']}", delete=False) as tmp:
+            tmp_path = tmp.name
+        job.processed_rows = export_format['writer'](tmp_path, header, rows, column_types, on_progress)
+
+        filename = f"{job.report_type}_report_{job.created_at.strftime('%Y%m%d_%H%M%S')}.{export_format['extension']}"
+        with open(tmp_path, 'rb') as fh:
+            job.file.save(filename, File(fh), save=False)
+
+        job.status = ExportJob.STATUS_COMPLETED
+        job.finished_at = timezone.now()
+        job.expires_at = job.finished_at + timedelta(hours=getattr(settings, 'EXPORT_JOB_TTL_HOURS', 24))
+        if not finish_job(job, file=job.file.name, status=job.status, processed_rows=job.processed_rows,
+                          total_rows=job.total_rows, finished_at=job.finished_at, expires_at=job.expires_at):
+            job.file.delete(save=False)
+            raise JobInterrupted(f"ExportJob {job.pk} is no longer running")
+    except JobInterrupted:
+        logger.warning('Export job %s was failed while running; its result is discarded', job.pk)
+        job.refresh_from_db()
+    except Exception as e:
+        logger.exception('Export job %s failed', job.pk)
+        job.status = ExportJob.STATUS_FAILED
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        if not finish_job(job, status=job.status, error=job.error, finished_at=job.finished_at):
+            job.refresh_from_db()
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return job
+
+
+def run_pending_export_jobs(max_jobs=None):
+    """Claim and run pending jobs until the queue is empty. Returns jobs run."""
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next_export_job()
+        if job is None:
+            break
+        run_export_job(job)
+        processed += 1
+    return processed
+
+
+def purge_expired_exports():
+    """Delete files of completed jobs past expires_at and mark them expired. Returns jobs purged."""
+    from .models import ExportJob
+
+    expired = ExportJob.objects.filter(
+        status=ExportJob.STATUS_COMPLETED,
+        expires_at__lt=timezone.now()
+    )
+    purged = 0
+    for job in expired:
+        # Cached results share one file between jobs; delete it with the last one
+        shared = job.file and ExportJob.objects.filter(
+            file=job.file.name,
+            status=ExportJob.STATUS_COMPLETED
+        ).exclude(pk=job.pk).exists()
+        if job.file and not shared:
+            job.file.delete(save=False)
+        job.file = ''
+        job.status = ExportJob.STATUS_EXPIRED
+        job.save(update_fields=['file', 'status'])
+        purged += 1
+    return purged
+
+
+_export_thread_lock = threading.Lock()
+
+
+def start_export_thread():
+    """Drain the export and import job queues in a daemon thread of this process (one thread at a time)"""
+    if not _export_thread_lock.acquire(blocking=False):
+        return
+
+    def drain():
+        from .import_utils import run_pending_import_jobs
+        from .models import ExportJob, ImportJob
+
+        held = True
+        try:
+            # Jobs left running by a previous process of this deploy
+            fail_stale_jobs(ExportJob)
+            fail_stale_jobs(ImportJob)
+            while True:
+                purge_expired_exports()
+                run_pending_export_jobs()
+                run_pending_import_jobs()
+                _export_thread_lock.release()
+                held = False
+                # A job queued while we were finishing would otherwise wait for the next enqueue
+                if not (ExportJob.objects.filter(status=ExportJob.STATUS_PENDING).exists()
+                        or ImportJob.objects.filter(status=ImportJob.STATUS_PENDING).exists()):
+                    break
+                if not _export_thread_lock.acquire(blocking=False):
+                    break
+                held = True
+        except Exception:
+            logger.exception('Export thread stopped')
+        finally:
+            if held:
+                _export_thread_lock.release()
+            connections.close_all()
+
+    threading.Thread(target=drain, name='export-jobs', daemon=True).start()
@@ -0,0 +1,159 @@
+"""Per-request user identity: role, state and approval (see IdentityMiddleware)"""
+import time
+from django.conf import settings
+from django.core.cache import caches
+
+IDENTITY_SESSION_KEY = '_identity'
+
+# Identity attribute -> User lookup; all of them are read in one joined query
+IDENTITY_LOOKUPS = {
+    'state_admin_id': 'state_profile__id',
+    'state_id': 'state_profile__state_id',
+    'state_approved': 'state_profile__approved',
+    'accounts_user_id': 'accounts_profile__id',
+    'accounts_approved': 'accounts_profile__approved',
+    'veteran_user_id': 'veteran_profile__id',
+    'veteran_approved': 'veteran_profile__approved',
+    'veteran_member_id': 'veteran_profile__veteran_member_id',
+    'member_state_id': 'veteran_profile__veteran_member__state_id',
+}
+
+
+class Identity:
+    """Who the current user is, without touching the profile tables.
+
+    Profile flags are independent (a user may have several profiles); `role`
+    is the one login routes on: superuser, state_admin, accounts, veteran,
+    user (no profile) or anonymous. is_superuser always comes from the user row.
+    """
+
+    def __init__(self, user=None, profile=None):
+        profile = profile or {}
+        self.is_authenticated = bool(user is not None and user.is_authenticated)
+        self.user_id = user.pk if self.is_authenticated else None
+        self.is_superuser = self.is_authenticated and user.is_superuser
+        for attr in IDENTITY_LOOKUPS:
+            setattr(self, attr, profile.get(attr))
+
+    def __repr__(self):
+        return f"<Identity user={self.user_id} role={self.role} state={self.home_state_id}>"
+
+    @property
+    def is_state_admin(self):
+        return self.state_admin_id is not None
+
+    @property
+    def is_accounts(self):
+        return self.accounts_user_id is not None
+
+    @property
+    def is_veteran(self):
+        return self.veteran_user_id is not None
+
+    @property
+    def role(self):
+        if not self.is_authenticated:
+            return 'anonymous'
+        if self.is_superuser:
+            return 'superuser'
+        if self.is_state_admin:
+            return 'state_admin'
+        if self.is_accounts:
+            return 'accounts'
+        if self.is_veteran:
+            return 'veteran'
+        return 'user'
+
+    @property
+    def approved(self):
+        """Approval of the profile `role` refers to (superusers are always approved)"""
+        return {
+            'superuser': True,
+            'state_admin': self.state_approved,
+            'accounts': self.accounts_approved,
+            'veteran': self.veteran_approved,
+        }.get(self.role, False)
+
+    @property
+    def is_approved_state_admin(self):
+        return self.is_state_admin and bool(self.state_approved)
+
+    @property
+    def home_state_id(self):
+        """State admin's state, else the veteran's member state"""
+        return self.state_id if self.is_state_admin else self.member_state_id
+
+    def can_access_state(self, state_id):
+        """Superusers, and approved state admins of that state"""
+        if self.is_superuser:
+            return True
+        try:
+            return self.is_approved_state_admin and self.state_id == int(state_id)
+        except (TypeError, ValueError):
+            return False
+
+
+def _version_cache():
+    return caches[getattr(settings, 'IDENTITY_CACHE_ALIAS', 'default')]
+
+
+def _version_key(user_id):
+    return f"identity_version:{user_id}"
+
+
+def identity_version(user_id):
+    """Current version of a user's identity; a missing (or evicted) version is
+    replaced by a new one, so it never matches an older session copy"""
+    cache = _version_cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_identity(user_id):
+    """Make every session of a user re-resolve its identity on the next request"""
+    if user_id:
+        _version_cache().set(_version_key(user_id), time.time_ns(), None)
+
+
+def resolve_identity(user_id):
+    """Profile values for a user in one query (LEFT JOINs to every profile table)"""
+    from django.contrib.auth.models import User
+
+    row = User.objects.filter(pk=user_id).values(*IDENTITY_LOOKUPS.values()).first() or {}
+    return {attr: row.get(lookup) for attr, lookup in IDENTITY_LOOKUPS.items()}
+
+
+def get_identity(request):
+    """The request user's Identity, from the session when still current.
+
+    The session copy is reused while it belongs to the same user, its
+    version matches the user's version in the shared cache (bumped by
+    invalidate_identity) and it is younger than IDENTITY_SESSION_MAX_AGE.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return Identity()
+
+    session = getattr(request, 'session', None)
+    if session is None:
+        return Identity(user, resolve_identity(user.pk))
+
+    version = identity_version(user.pk)
+    max_age = getattr(settings, 'IDENTITY_SESSION_MAX_AGE', 300)
+    stored = session.get(IDENTITY_SESSION_KEY)
+    if (stored and stored.get('user_id') == user.pk and stored.get('version') == version
+            and time.time() - stored.get('resolved_at', 0) < max_age):
+        return Identity(user, stored['profile'])
+
+    profile = resolve_identity(user.pk)
+    session[IDENTITY_SESSION_KEY] = {
+        'user_id': user.pk,
+        'version': version,
+        'resolved_at': int(time.time()),
+        'profile': profile,
+    }
+    return Identity(user, profile)
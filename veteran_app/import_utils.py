@@ -0,0 +1,501 @@
+"""Bulk member import from CSV/XLSX spreadsheets, run as background ImportJobs"""
+import csv
+import importlib.util
+import logging
+import os
+import uuid
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Valid rows are written (numbered and bulk-created) in batches of this size
+IMPORT_BATCH_SIZE = 500
+# Per-row errors kept on the job; further errors are only counted
+IMPORT_MAX_REPORTED_ERRORS = 1000
+IMPORT_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+# extension -> module the reader needs (None: standard library)
+IMPORT_FORMATS = {
+    'csv': None,
+    'xlsx': 'openpyxl',
+}
+
+IMPORT_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y')
+IMPORT_TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active', 'approved'}
+IMPORT_FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive', 'pending', ''}
+
+# Columns resolved from the lookup tables by (case-insensitive) name
+IMPORT_LOOKUP_COLUMNS = ('state', 'rank', 'branch', 'blood_group', 'medical_category', 'nearest_echs')
+
+# Columns every spreadsheet must have (enrolled_date defaults to today, as in add_member)
+IMPORT_REQUIRED_COLUMNS = (
+    'name', 'service_number', 'rank', 'branch', 'blood_group', 'date_of_birth',
+    'contact', 'address', 'date_of_joining', 'retired_on', 'unit_served',
+    'nearest_dhq_text', 'association_date', 'spouse_name',
+)
+
+# Filled in by the import itself, never from the spreadsheet
+IMPORT_EXCLUDED_FIELDS = (
+    'association_id', 'profile_photo', 'document', 'birthday_key', 'subscription_due',
+    'renewal_due_date', 'created_by', 'approved', 'created_at', 'updated_at',
+)
+
+# Columns offered in the downloadable template
+IMPORT_TEMPLATE_COLUMNS = IMPORT_REQUIRED_COLUMNS + (
+    'enrolled_date', 'alternate_email', 'membership', 'subscription_ref_no',
+    'subscription_paid_on', 'subscription_amount',
+)
+
+
+def available_import_formats():
+    """Extensions whose reader can be imported in this deployment"""
+    return [
+        extension for extension, requires in IMPORT_FORMATS.items()
+        if requires is None or importlib.util.find_spec(requires) is not None
+    ]
+
+
+def _column_key(value):
+    return str(value or '').strip().lower().replace(' ', '_').replace('.', '')
+
+
+def import_columns():
+    """Return {column key: field name} for every column the import understands.
+
+    Model field names are accepted as well as their verbose names
+    ("Last Ship Served" -> unit_served); field names win on clashes.
+    """
+    from .models import VeteranMember
+
+    fields = [
+        field for field in VeteranMember._meta.concrete_fields
+        if field.name not in IMPORT_EXCLUDED_FIELDS
+    ]
+    columns = {field.name: field.name for field in fields}
+    columns['subscription_amount'] = 'subscription_amount'
+    for field in fields:
+        columns.setdefault(_column_key(field.verbose_name), field.name)
+    return columns
+
+
+def read_import_rows(path):
+    """Yield the raw rows of a spreadsheet (header first) without loading it whole"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'csv':
+        with open(path, newline='', encoding='utf-8-sig') as fh:
+            yield from csv.reader(fh)
+    elif extension == 'xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported import format: {extension}")
+
+
+def _is_blank(values):
+    return all(value is None or str(value).strip() == '' for value in values)
+
+
+def _lookup_maps(state):
+    """Pre-resolve lookup columns to {casefolded name: object}, one query per table"""
+    from .models import BloodGroup, Branch, ECHS, MedicalCategory, Rank, State
+
+    def by_name(objects):
+        return {obj.name.strip().casefold(): obj for obj in objects}
+
+    states = by_name(State.objects.all())
+    states.update({obj.code.casefold(): obj for obj in states.values()})
+    return {
+        'state': states,
+        'rank': by_name(Rank.objects.all()),
+        'branch': by_name(Branch.objects.all()),
+        'blood_group': by_name(BloodGroup.objects.all()),
+        'medical_category': by_name(MedicalCategory.objects.all()),
+        'nearest_echs': by_name(ECHS.objects.all()),
+    }
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for date_format in IMPORT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            pass
+    raise ValidationError('Enter a date as YYYY-MM-DD or DD/MM/YYYY.')
+
+
+def _parse_boolean(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in IMPORT_TRUE_VALUES:
+        return True
+    if value in IMPORT_FALSE_VALUES:
+        return False
+    raise ValidationError('Enter yes or no.')
+
+
+def _cell_text(value):
+    # Spreadsheet apps store phone and service numbers as floats (9876543210.0)
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _field_value(field, value):
+    """Spreadsheet cell -> value for a model field; to_python() does the rest in full_clean()"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        if field.has_default():
+            return field.get_default()
+        return None if field.null else ''
+    if isinstance(field, models.DateField):
+        return _parse_date(value if not isinstance(value, str) else value.strip())
+    if isinstance(field, models.BooleanField):
+        return _parse_boolean(value)
+    return _cell_text(value)
+
+
+class ImportRow:
+    """One validated spreadsheet row waiting to be written"""
+
+    def __init__(self, number, member, amount):
+        self.number = number
+        self.member = member
+        self.amount = amount
+
+
+def build_import_row(number, record, job, lookups, user):
+    """Validate one {field name: cell} record and return an ImportRow.
+
+    Raises ValidationError (message_dict keyed by column) for invalid rows.
+    Validation is the model's own full_clean(); uniqueness is checked per
+    batch by the caller instead of one query per row.
+    """
+    from .models import VeteranMember
+
+    errors = {}
+    values = {}
+    for field_name in IMPORT_LOOKUP_COLUMNS:
+        cell = record.pop(field_name, None)
+        cell = _cell_text(cell) if cell is not None else ''
+        if not cell:
+            # The job fixes the state; other lookups are skipped by full_clean() below
+            if field_name != 'state' and not VeteranMember._meta.get_field(field_name).null:
+                errors[field_name] = ['This field is required.']
+            continue
+        obj = lookups[field_name].get(cell.casefold())
+        if obj is None:
+            if field_name in ('medical_category', 'nearest_echs'):
+                # Free text, as the form's "custom" fields allow
+                values[f'{field_name}_text'] = cell
+            else:
+                errors[field_name] = [f'Unknown {field_name.replace("_", " ")} "{cell}".']
+        elif field_name == 'state' and obj != job.state:
+            errors[field_name] = [f'Rows must belong to {job.state.name}.']
+        elif field_name != 'state':
+            values[field_name] = obj
+
+    amount = None
+    cell = record.pop('subscription_amount', None)
+    if cell not in (None, ''):
+        try:
+            amount = Decimal(_cell_text(cell))
+        except InvalidOperation:
+            errors['subscription_amount'] = ['Enter a number.']
+
+    for field_name, cell in record.items():
+        if field_name.endswith('_text') and values.get(field_name):
+            continue
+        field = VeteranMember._meta.get_field(field_name)
+        try:
+            values[field_name] = _field_value(field, cell)
+        except ValidationError as e:
+            errors[field_name] = e.messages
+
+    member = VeteranMember(state=job.state, created_by=user, approved=True, **values)
+    if not member.enrolled_date and 'enrolled_date' not in errors:
+        member.enrolled_date = date.today()
+
+    try:
+        # Related objects come from the lookup maps, so skip the per-row existence queries
+        member.full_clean(exclude=list(errors) + list(IMPORT_LOOKUP_COLUMNS) + ['created_by'], validate_unique=False)
+    except ValidationError as e:
+        errors.update(e.message_dict)
+
+    today = date.today()
+    for field_name in ('date_of_birth', 'enrolled_date', 'date_of_joining', 'retired_on', 'association_date', 'subscription_paid_on'):
+        value = getattr(member, field_name, None)
+        if isinstance(value, date) and value > today and field_name not in errors:
+            errors[field_name] = ['Cannot be a future date.']
+
+    if errors:
+        raise ValidationError(errors)
+    return ImportRow(number, member, amount)
+
+
+def _subscription_financial_year():
+    """Current financial year, created the way add_member does"""
+    from .models import FinancialYear
+
+    current_year = datetime.now().year
+    financial_year, _ = FinancialYear.objects.get_or_create(
+        year=f"{current_year}-{current_year+1}",
+        defaults={
+            'start_date': date(current_year, 4, 1),
+            'end_date': date(current_year + 1, 3, 31),
+            'is_active': True
+        }
+    )
+    return financial_year
+
+
+class MemberImporter:
+    """Streams a spreadsheet into VeteranMember rows in batches for one ImportJob"""
+
+    def __init__(self, job, batch_size=IMPORT_BATCH_SIZE):
+        self.job = job
+        self.user = job.created_by
+        self.batch_size = batch_size
+        self.lookups = _lookup_maps(job.state)
+        self.columns = import_columns()
+        self.seen_service_numbers = set()
+        self.seen_association_numbers = set()
+        self.errors = []
+        self.error_rows = set()
+        self.created = 0
+        self.financial_year = None
+
+    def add_error(self, row_number, field, message):
+        self.error_rows.add(row_number)
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'field': field, 'message': message})
+
+    def map_header(self, header):
+        """Spreadsheet header -> list of field names (None for ignored columns)"""
+        fields = [self.columns.get(_column_key(title)) for title in header]
+        missing = [column for column in IMPORT_REQUIRED_COLUMNS if column not in fields]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+        return fields
+
+    def records(self, rows, fields):
+        """Yield (row number, {field name: cell}) for the non-blank data rows"""
+        for number, values in enumerate(rows, start=2):
+            if _is_blank(values):
+                continue
+            yield number, {
+                field: value for field, value in zip(fields, values) if field is not None
+            }
+
+    def run(self, on_progress=None):
+        """Import the job's file; returns (created, error rows)"""
+        from .export_utils import update_running_job
+
+        path = self.job.file.path
+        rows = read_import_rows(path)
+        fields = self.map_header(next(rows, None) or [])
+
+        # A cheap first pass (no validation) so progress has a denominator
+        counted = read_import_rows(path)
+        next(counted, None)
+        update_running_job(self.job, total_rows=sum(1 for _ in self.records(counted, fields)))
+
+        batch = []
+        processed = 0
+        for number, record in self.records(rows, fields):
+            try:
+                batch.append(build_import_row(number, record, self.job, self.lookups, self.user))
+            except ValidationError as e:
+                for field, messages in e.message_dict.items():
+                    for message in messages:
+                        self.add_error(number, field, message)
+            processed += 1
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+            # Also while only invalid rows are read, so the heartbeat keeps moving
+            if on_progress and processed % self.batch_size == 0:
+                on_progress(processed, self.created, len(self.error_rows))
+        if batch:
+            self.write_batch(batch)
+        if on_progress:
+            on_progress(processed, self.created, len(self.error_rows))
+        return self.created, len(self.error_rows)
+
+    def reject_duplicates(self, batch):
+        """Drop rows whose service or association number is already used (one query each)"""
+        from .models import VeteranMember
+
+        service_numbers = {row.member.service_number for row in batch}
+        taken_service = set(VeteranMember.objects.filter(
+            service_number__in=service_numbers
+        ).values_list('service_number', flat=True))
+        association_numbers = {row.member.association_number for row in batch if row.member.association_number}
+        taken_association = set(VeteranMember.objects.filter(
+            association_number__in=association_numbers
+        ).values_list('association_number', flat=True))
+
+        accepted = []
+        for row in batch:
+            member = row.member
+            if member.service_number in taken_service or member.service_number in self.seen_service_numbers:
+                self.add_error(row.number, 'service_number', f'Service number {member.service_number} already exists.')
+                continue
+            number = member.association_number
+            if number and (number in taken_association or number in self.seen_association_numbers):
+                self.add_error(row.number, 'association_number', f'Association number {number} already exists.')
+                continue
+            self.seen_service_numbers.add(member.service_number)
+            if number:
+                self.seen_association_numbers.add(number)
+            accepted.append(row)
+        return accepted
+
+    def write_batch(self, batch):
+        """Number and bulk_create one batch (plus subscription transactions) in one transaction"""
+        from .models import AssociationSequence, Transaction, VeteranMember
+
+        with transaction.atomic():
+            batch = self.reject_duplicates(batch)
+            unnumbered = [row.member for row in batch if not row.member.association_number]
+            numbers = AssociationSequence.allocate_numbers(self.job.state, len(unnumbered))
+            for member, number in zip(unnumbered, numbers):
+                member.association_number = number
+
+            for row in batch:
+                # As add_member: a recorded subscription payment activates the membership
+                if row.amount and row.amount > 0 and row.member.subscription_paid_on:
+                    row.member.membership = True
+                row.member.set_derived_fields()
+            VeteranMember.objects.bulk_create([row.member for row in batch])
+
+            payments = []
+            for row in batch:
+                if not (row.amount and row.amount > 0 and row.member.subscription_paid_on):
+                    continue
+                if self.financial_year is None:
+                    self.financial_year = _subscription_financial_year()
+                payments.append(Transaction(
+                    transaction_id=f"SUB{datetime.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:8].upper()}",
+                    veteran=row.member,
+                    transaction_type='subscription',
+                    amount=row.amount,
+                    payment_method='online',
+                    reference_number=row.member.subscription_ref_no or '',
+                    description=f'Subscription payment by {row.member.name}',
+                    financial_year=self.financial_year,
+                    recorded_by=self.user
+                ))
+            Transaction.objects.bulk_create(payments)
+        self.created += len(batch)
+
+
+def enqueue_import(user, state, uploaded_file):
+    """Store an uploaded spreadsheet as a pending ImportJob and hand it to the job runner"""
+    from .export_utils import start_export_thread
+    from .models import ImportJob
+
+    job = ImportJob(state=state, created_by=user, original_name=uploaded_file.name[:255])
+    job.file.save(os.path.basename(uploaded_file.name), uploaded_file, save=False)
+    job.save()
+    if getattr(settings, 'EXPORT_JOB_RUNNER', 'thread') == 'thread':
+        # Start after commit so the background thread can see the job row
+        transaction.on_commit(start_export_thread)
+    return job
+
+
+def _after_import(state_id):
+    """bulk_create skips the VeteranMember signals: refresh what they would have"""
+    from .birthday_utils import invalidate_birthday_cache
+    from .stats_utils import refresh_membership_stats
+    from .subscription_utils import invalidate_subscription_due_lists
+
+    refresh_membership_stats(state_id)
+    refresh_membership_stats()
+    invalidate_birthday_cache()
+    invalidate_subscription_due_lists()
+
+
+def run_import_job(job):
+    """Import a claimed job's spreadsheet, tracking progress; failures are recorded on the job.
+
+    Like run_export_job, every write is conditional on the job still
+    running; a job failed as stale keeps that failure.
+    """
+    from .export_utils import JobInterrupted, finish_job, update_running_job
+    from .models import ImportJob
+
+    def on_progress(processed, created, error_count):
+        update_running_job(
+            job,
+            processed_rows=processed,
+            created_count=created,
+            error_count=error_count
+        )
+
+    importer = MemberImporter(job)
+    interrupted = False
+    try:
+        created, error_count = importer.run(on_progress)
+        job.status = ImportJob.STATUS_COMPLETED
+    except JobInterrupted:
+        logger.warning('Import job %s was failed while running; stopped reading it', job.pk)
+        created, error_count = importer.created, len(importer.error_rows)
+        interrupted = True
+    except Exception as e:
+        logger.exception('Import job %s failed', job.pk)
+        created, error_count = importer.created, len(importer.error_rows)
+        job.status = ImportJob.STATUS_FAILED
+        job.error = str(e)
+
+    if created:
+        _after_import(job.state_id)
+
+    # The spreadsheet holds personal data; the error report keeps row numbers.
+    # This worker was the one reading it, so it is safe to delete now.
+    if job.file:
+        job.file.delete(save=False)
+        ImportJob.objects.filter(pk=job.pk).update(file='')
+
+    finished = not interrupted and finish_job(
+        job,
+        status=job.status,
+        error=job.error,
+        created_count=created,
+        error_count=error_count,
+        errors=importer.errors,
+        finished_at=timezone.now()
+    )
+    if not finished:
+        # Failed as stale: keep that failure, but count the members already created
+        ImportJob.objects.filter(pk=job.pk).update(created_count=created, error_count=error_count)
+    job.refresh_from_db()
+    return job
+
+
+def run_pending_import_jobs(max_jobs=None):
+    """Claim and run pending import jobs until the queue is empty. Returns jobs run."""
+    from .export_utils import claim_next_job
+    from .models import ImportJob
+
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next_job(ImportJob)
+        if job is None:
+            break
+        run_import_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,67 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from veteran_app.middleware import SUSPICIOUS_PATTERNS, RequestValidationMiddleware
+
+LEGACY_PATTERNS = [pattern for patterns in SUSPICIOUS_PATTERNS.values() for pattern in patterns]
+
+def legacy_scan(data):
+    """The previous check: per value, lowercase and scan once for every pattern"""
+    for value in data.values():
+        if any(pattern in str(value).lower() for pattern in LEGACY_PATTERNS):
+            return True
+    return False
+
+class Command(BaseCommand):
+    help = 'Benchmark RequestValidationMiddleware per-request cost against POST payload size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='1,10,100,1000',
+            help='Comma-separated total payload sizes in KB',
+        )
+        parser.add_argument(
+            '--fields',
+            type=int,
+            default=20,
+            help='Number of POST fields the payload is split across',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Requests timed per payload size',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.ALLOWED_HOSTS or 'testserver' not in settings.ALLOWED_HOSTS:
+            settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ['testserver']
+        factory = RequestFactory()
+        middleware = RequestValidationMiddleware(lambda request: None)
+        repeat = options['repeat']
+        fields = options['fields']
+
+        self.stdout.write(f"{'Payload':>10} {'Legacy (ms)':>12} {'Current (ms)':>14} {'Speed-up':>9}")
+        for size_kb in [int(size) for size in options['sizes'].split(',') if size.strip()]:
+            # Clean member-form-like text (nothing blocked, so every value is scanned to the end).
+            # The colon makes every value go through the lowercase-and-check path.
+            field_size = max(size_kb * 1024 // fields, 1)
+            text = ('Served on INS Vikrant; Address: 12 Harbour Road, Kochi. ' * (field_size // 57 + 1))[:field_size]
+            data = {f'field_{i}': text for i in range(fields)}
+            request = factory.post('/state/1/add-member/', data)
+            request.POST  # parse once, outside the timings
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                legacy_scan(request.GET)
+                legacy_scan(request.POST)
+            legacy = (time.perf_counter() - start) * 1000 / repeat
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                middleware.process_request(request)
+            compiled = (time.perf_counter() - start) * 1000 / repeat
+
+            self.stdout.write(f"{size_kb:>8}KB {legacy:>12.3f} {compiled:>14.3f} {legacy / compiled:>8.1f}x")
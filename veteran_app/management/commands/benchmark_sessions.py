@@ -0,0 +1,57 @@
+import statistics
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+class Command(BaseCommand):
+    help = 'Compare authenticated request latency and session queries across SESSION_BACKEND engines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--username',
+            help='User to log in as (default: first superuser)',
+        )
+        parser.add_argument(
+            '--path',
+            default='/about/',
+            help='Page requested on each iteration',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests timed per engine',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(username=options['username']) if options['username'] else User.objects.filter(is_superuser=True)
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to log in as; pass --username.')
+
+        allowed_hosts = list(settings.ALLOWED_HOSTS) + ['testserver']
+        self.stdout.write(f"{'Engine':<16} {'Median (ms)':>12} {'p95 (ms)':>10} {'Session reads':>14} {'Session writes':>15}")
+        for backend, engine in settings.SESSION_ENGINES.items():
+            with override_settings(SESSION_ENGINE=engine, ALLOWED_HOSTS=allowed_hosts):
+                client = Client()
+                client.force_login(user)
+                client.get(options['path'])  # warm up (first activity write, cache fill)
+
+                timings = []
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(options['requests']):
+                        start = time.perf_counter()
+                        client.get(options['path'])
+                        timings.append((time.perf_counter() - start) * 1000)
+
+            session_queries = [query['sql'] for query in queries.captured_queries if 'django_session' in query['sql']]
+            reads = sum(1 for sql in session_queries if sql.startswith('SELECT'))
+            writes = len(session_queries) - reads
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            self.stdout.write(
+                f"{backend:<16} {statistics.median(timings):>12.2f} {p95:>10.2f} {reads:>14} {writes:>15}"
+            )
@@ -1,26 +1,88 @@
 from django.core.management.base import BaseCommand
-from veteran_app.models import VeteranMember
+from django.db import transaction
+from django.utils import timezone
+from veteran_app.models import AssociationSequence, State, VeteranMember, format_association_number
 
 class Command(BaseCommand):
     help = 'Generate association numbers for existing veterans who do not have one'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the numbers that would be assigned without saving anything',
+        )
+        parser.add_argument(
+            '--state',
+            help='Only number members of this state code (e.g. KL)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Members written per bulk update',
+        )
+
     def handle(self, *args, **options):
-        veterans_without_numbers = VeteranMember.objects.filter(association_number__isnull=True)
-        count = 0
-        
-        for veteran in veterans_without_numbers:
-            if veteran.state:  # Only generate if veteran has a state
-                veteran.generate_association_number()
-                veteran.save(update_fields=['association_number'])
-                count += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Generated association number {veteran.association_number} for {veteran.name}'
-                    )
-                )
-        
-        self.stdout.write(
-            self.style.SUCCESS(
-                f'Successfully generated association numbers for {count} veterans'
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+        veterans_without_numbers = VeteranMember.objects.filter(
+            association_number__isnull=True,
+            state__isnull=False
+        )
+        states = State.objects.filter(
+            id__in=veterans_without_numbers.values('state_id')
+        ).order_by('name')
+        if options['state']:
+            states = states.filter(code__iexact=options['state'])
+
+        total = 0
+        for state in states:
+            members = list(
+                veterans_without_numbers.filter(state=state).order_by('association_id').only('association_id', 'name')
             )
-        )
\ No newline at end of file
+            # Reserving and writing together: a failed write releases the range
+            with transaction.atomic():
+                numbers = self.reserve_numbers(state, len(members), dry_run)
+                for member, number in zip(members, numbers):
+                    member.association_number = number
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{number} -> {member.name}')
+
+                if dry_run:
+                    self.stdout.write(f'{state.code}: would number {len(members)} members ({numbers[0]} to {numbers[-1]})')
+                else:
+                    self.write_numbers(state, members, batch_size)
+            total += len(members)
+
+        prefix = 'Dry run: would generate' if dry_run else 'Successfully generated'
+        self.stdout.write(
+            self.style.SUCCESS(f'{prefix} association numbers for {total} veterans')
+        )
+
+    def reserve_numbers(self, state, count, dry_run):
+        if not dry_run:
+            return AssociationSequence.allocate_numbers(state, count)
+
+        # Preview the same numbers allocate_numbers() would hand out
+        numbers = []
+        next_value = AssociationSequence.current_value(state) + 1
+        while len(numbers) < count:
+            needed = count - len(numbers)
+            candidates = [format_association_number(state.code, next_value + i) for i in range(needed)]
+            taken = set(VeteranMember.objects.filter(
+                association_number__in=candidates
+            ).values_list('association_number', flat=True))
+            numbers.extend(number for number in candidates if number not in taken)
+            next_value += needed
+        return numbers
+
+    def write_numbers(self, state, members, batch_size):
+        now = timezone.now()
+        for offset in range(0, len(members), batch_size):
+            batch = members[offset:offset + batch_size]
+            for member in batch:
+                # bulk_update skips auto_now; report data versions rely on updated_at
+                member.updated_at = now
+            VeteranMember.objects.bulk_update(batch, ['association_number', 'updated_at'])
+            self.stdout.write(f'{state.code}: {offset + len(batch)}/{len(members)}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from veteran_app.stats_utils import rebuild_membership_stats
+
+class Command(BaseCommand):
+    help = 'Rebuild the MembershipStats rollup (global and per state) from VeteranMember'
+
+    def handle(self, *args, **options):
+        rows = rebuild_membership_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {rows} membership statistics rows')
+        )
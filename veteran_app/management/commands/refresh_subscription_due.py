@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from veteran_app.subscription_utils import compute_subscription_due_lists, sync_subscription_due
+
+class Command(BaseCommand):
+    help = 'Backfill VeteranMember.subscription_due and precompute the Due Soon / Overdue lists (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows per bulk update when backfilling subscription_due',
+        )
+        parser.add_argument(
+            '--skip-lists',
+            action='store_true',
+            help='Only backfill subscription_due, do not precompute the due lists',
+        )
+
+    def handle(self, *args, **options):
+        fixed = sync_subscription_due(batch_size=options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Updated subscription_due on {fixed} members')
+        )
+
+        if options['skip_lists']:
+            return
+
+        lists = compute_subscription_due_lists()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Precomputed due lists: {len(lists['due_soon'])} due soon, {len(lists['overdue'])} overdue"
+            )
+        )
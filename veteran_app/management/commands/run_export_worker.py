@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from veteran_app.export_utils import purge_expired_exports, run_pending_export_jobs
+from veteran_app.import_utils import run_pending_import_jobs
+
+class Command(BaseCommand):
+    help = 'Run queued report export and member import jobs (use with EXPORT_JOB_RUNNER=worker)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs currently queued and exit',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between queue checks when idle',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Export worker started')
+        while True:
+            purged = purge_expired_exports()
+            if purged:
+                self.stdout.write(f'Purged {purged} expired exports')
+
+            exported = run_pending_export_jobs()
+            if exported:
+                self.stdout.write(self.style.SUCCESS(f'Processed {exported} export jobs'))
+
+            imported = run_pending_import_jobs()
+            if imported:
+                self.stdout.write(self.style.SUCCESS(f'Processed {imported} import jobs'))
+
+            processed = exported + imported
+
+            if options['once']:
+                break
+            if not processed:
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from veteran_app.schedule_utils import run_scheduled_reports
+
+class Command(BaseCommand):
+    help = 'Generate scheduled report configurations that are due (run from cron, e.g. hourly)'
+
+    def handle(self, *args, **options):
+        ran = run_scheduled_reports()
+        self.stdout.write(
+            self.style.SUCCESS(f'Ran {ran} scheduled report configurations')
+        )
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import KEY_PREFIX
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+class Command(BaseCommand):
+    help = 'Copy live database sessions into the session cache (run after switching to SESSION_BACKEND=cached_db)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Sessions read per database round trip',
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE != 'django.contrib.sessions.backends.cached_db':
+            raise CommandError('SESSION_BACKEND is not cached_db; nothing to warm.')
+
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        now = timezone.now()
+        sessions = Session.objects.filter(expire_date__gt=now)
+        warmed = 0
+        for session in sessions.iterator(chunk_size=options['batch_size']):
+            # Same key and payload cached_db.SessionStore.load() would cache
+            timeout = int((session.expire_date - now).total_seconds())
+            cache.set(KEY_PREFIX + session.session_key, session.get_decoded(), timeout)
+            warmed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Cached {warmed} live sessions'))
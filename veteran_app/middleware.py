@@ -1,7 +1,10 @@
 from django.utils.deprecation import MiddlewareMixin
 from django.http import HttpResponseForbidden
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from .identity_utils import get_identity
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -21,34 +24,87 @@ class SecurityHeadersMiddleware(MiddlewareMixin):
         
         return response
 
+# Substrings that get a GET/POST value rejected (matched case-insensitively),
+# grouped by a character sequence each of them contains that has no case.
+# The anchors are searched in the raw text; only values containing one are
+# lowercased and checked for that anchor's patterns.
+SUSPICIOUS_PATTERNS = {
+    '..': ('../', '..\\'),
+    '<': ('<script',),
+    ':': ('javascript:', 'vbscript:'),
+    '=': ('onload=', 'onerror='),
+    '(': ('eval(', 'expression('),
+}
+
+
+def find_suspicious_pattern(text):
+    """Return the first suspicious pattern found in text, or None"""
+    lowered = None
+    for anchor, patterns in SUSPICIOUS_PATTERNS.items():
+        if anchor not in text:
+            continue
+        if lowered is None:
+            lowered = text.lower()
+        for pattern in patterns:
+            if pattern in lowered:
+                return pattern
+    return None
+
+
+def find_suspicious_value(data):
+    """Return the first (key, value) of a QueryDict holding a suspicious pattern, or None.
+
+    All values are scanned as one newline-joined string (no pattern contains
+    a newline, so matches cannot span values); the offending key is only
+    looked up when something matched.
+    """
+    if not data or not find_suspicious_pattern('\n'.join(str(value) for value in data.values())):
+        return None
+    for key, value in data.items():
+        if find_suspicious_pattern(str(value)):
+            return key, value
+    return None
+
 class RequestValidationMiddleware(MiddlewareMixin):
     """Validate requests for security"""
     
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        # Path prefixes whose requests are not scanned (settings.REQUEST_VALIDATION_EXEMPT_PATHS)
+        self.exempt_paths = tuple(getattr(settings, 'REQUEST_VALIDATION_EXEMPT_PATHS', ('/admin/',)))
+    
     def process_request(self, request):
-        # Skip validation for admin URLs
-        if request.path.startswith('/admin/'):
+        # Skip validation for exempt URLs (admin by default)
+        if self.exempt_paths and request.path.startswith(self.exempt_paths):
             return None
-            
-        # Block requests with suspicious patterns
-        suspicious_patterns = [
-            '../', '..\\', '<script', 'javascript:', 'vbscript:',
-            'onload=', 'onerror=', 'eval(', 'expression('
-        ]
         
-        # Check query parameters and POST data
-        for key, value in request.GET.items():
-            if any(pattern in str(value).lower() for pattern in suspicious_patterns):
-                logger.warning(f"Suspicious request blocked: {request.path} - {key}={value}")
-                return HttpResponseForbidden("Invalid request")
+        # Block requests with suspicious patterns in query parameters and POST data
+        suspicious = find_suspicious_value(request.GET)
+        if suspicious:
+            logger.warning(f"Suspicious request blocked: {request.path} - {suspicious[0]}={suspicious[1]}")
+            return HttpResponseForbidden("Invalid request")
         
         if request.method == 'POST':
-            for key, value in request.POST.items():
-                if any(pattern in str(value).lower() for pattern in suspicious_patterns):
-                    logger.warning(f"Suspicious POST blocked: {request.path} - {key}={value}")
-                    return HttpResponseForbidden("Invalid request")
+            suspicious = find_suspicious_value(request.POST)
+            if suspicious:
+                logger.warning(f"Suspicious POST blocked: {request.path} - {suspicious[0]}={suspicious[1]}")
+                return HttpResponseForbidden("Invalid request")
         
         return None
 
+def touch_session(session, key):
+    """Store the current time under key, at most once per SESSION_ACTIVITY_UPDATE_INTERVAL seconds.
+
+    Every session write is a database UPDATE, so activity markers are only
+    refreshed when they are older than the interval. Each refresh also
+    re-saves the session and so slides its expiry (SESSION_COOKIE_AGE).
+    """
+    now = int(time.time())
+    interval = getattr(settings, 'SESSION_ACTIVITY_UPDATE_INTERVAL', 300)
+    last = session.get(key)
+    if not isinstance(last, int) or now - last >= interval:
+        session[key] = now
+
 class SessionSecurityMiddleware(MiddlewareMixin):
     """Enhanced session security"""
     
@@ -70,11 +126,14 @@ class SessionSecurityMiddleware(MiddlewareMixin):
                 return None
             
             # Store IP in session and mark as verified after first request
-            request.session['ip_address'] = current_ip
-            request.session['ip_verified'] = True
+            # (only written when they change, so the session stays unmodified)
+            if session_ip != current_ip:
+                request.session['ip_address'] = current_ip
+            if not request.session.get('ip_verified', False):
+                request.session['ip_verified'] = True
             
             # Update last activity
-            request.session['last_activity'] = request.session.get('last_activity', 0) + 1
+            touch_session(request.session, 'last_activity')
         
         return None
     
@@ -96,7 +155,18 @@ class UserStateMiddleware(MiddlewareMixin):
             
         if hasattr(request, 'user') and request.user.is_authenticated:
             # Update user's last activity
-            request.session['last_seen'] = request.session.get('last_seen', 0) + 1
+            touch_session(request.session, 'last_seen')
+        return None
+
+class IdentityMiddleware(MiddlewareMixin):
+    """Attach request.identity: the user's role, state and approval.
+
+    Resolved on first access (one joined query) and kept in the session until
+    a profile changes; see identity_utils.get_identity.
+    """
+    
+    def process_request(self, request):
+        request.identity = SimpleLazyObject(lambda: get_identity(request))
         return None
 
 class GlobalAnnouncementMiddleware(MiddlewareMixin):
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:55
+
+from django.db import migrations, models
+
+
+def populate_birthday_key(apps, schema_editor):
+    """Backfill birthday_key (MMDD) for existing members"""
+    VeteranMember = apps.get_model('veteran_app', 'VeteranMember')
+    members = []
+    for member in VeteranMember.objects.only('association_id', 'date_of_birth').iterator():
+        if member.date_of_birth:
+            member.birthday_key = member.date_of_birth.month * 100 + member.date_of_birth.day
+            members.append(member)
+    VeteranMember.objects.bulk_update(members, ['birthday_key'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veteran_app', '0029_associationverification_permission_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='veteranmember',
+            name='birthday_key',
+            field=models.PositiveSmallIntegerField(blank=True, db_index=True, editable=False, help_text='Birthday as MMDD, kept in sync with date_of_birth for indexed lookups', null=True),
+        ),
+        migrations.RunPython(populate_birthday_key, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-17 19:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veteran_app', '0030_veteranmember_birthday_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MembershipStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(help_text="'all' for the global row, 'state_<id>' for a state", max_length=20, unique=True)),
+                ('total_members', models.IntegerField(default=0)),
+                ('active_members', models.IntegerField(default=0)),
+                ('inactive_members', models.IntegerField(default=0)),
+                ('approved_members', models.IntegerField(default=0)),
+                ('pending_members', models.IntegerField(default=0)),
+                ('this_month_members', models.IntegerField(default=0)),
+                ('month', models.DateField(help_text='First day of the month this_month_members refers to')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('state', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='membership_stats', to='veteran_app.state')),
+            ],
+            options={
+                'verbose_name': 'Membership Statistics',
+                'verbose_name_plural': 'Membership Statistics',
+            },
+        ),
+    ]
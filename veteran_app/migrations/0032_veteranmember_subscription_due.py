@@ -0,0 +1,29 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:02
+
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def populate_subscription_due(apps, schema_editor):
+    """Backfill subscription_due (subscription_paid_on + 365 days) for existing members"""
+    VeteranMember = apps.get_model('veteran_app', 'VeteranMember')
+    members = []
+    for member in VeteranMember.objects.filter(subscription_paid_on__isnull=False).only('association_id', 'subscription_paid_on').iterator():
+        member.subscription_due = member.subscription_paid_on + timedelta(days=365)
+        members.append(member)
+    VeteranMember.objects.bulk_update(members, ['subscription_due'], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veteran_app', '0031_membershipstats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='veteranmember',
+            name='subscription_due',
+            field=models.DateField(blank=True, db_index=True, editable=False, help_text='Kept in sync with subscription_paid_on (+365 days) for indexed due/overdue lookups', null=True),
+        ),
+        migrations.RunPython(populate_subscription_due, reverse_code=migrations.RunPython.noop),
+    ]
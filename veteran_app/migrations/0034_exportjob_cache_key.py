@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veteran_app', '0033_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, help_text='Parameter hash and data version; completed jobs with the same key are reused', max_length=100),
+        ),
+    ]
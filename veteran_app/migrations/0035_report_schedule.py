@@ -0,0 +1,34 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veteran_app', '0034_exportjob_cache_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='report_config',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to='veteran_app.reportconfiguration'),
+        ),
+        migrations.AddField(
+            model_name='reportconfiguration',
+            name='last_run_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportconfiguration',
+            name='next_run_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reportconfiguration',
+            name='schedule',
+            field=models.CharField(blank=True, choices=[('', 'Not scheduled'), ('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='', help_text='Precompute this report off-peak (manage.py run_scheduled_reports)', max_length=20),
+        ),
+    ]
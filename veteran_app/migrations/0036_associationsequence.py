@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veteran_app', '0035_report_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssociationSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('state', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='association_sequence', to='veteran_app.state')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-17 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('veteran_app', '0037_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last progress write of the running job; stale jobs are failed from this', null=True),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last progress write of the running job; stale jobs are failed from this', null=True),
+        ),
+    ]
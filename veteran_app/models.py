@@ -2,7 +2,8 @@
 
 import os
 from datetime import date, timedelta
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator, FileExtensionValidator
 from django.core.exceptions import ValidationError
@@ -15,6 +16,8 @@ from .validators import (
     validate_file_size,
     validate_resume_extension
 )
+from .birthday_utils import birthday_key_for
+from .subscription_utils import SUBSCRIPTION_STATUSES, classify_subscription, subscription_due_for
 
 # RBAC MODELS
 class Permission(models.Model):
@@ -189,6 +192,33 @@ class DHQ(models.Model):
     def __str__(self):
         return self.name
 
+ASSOCIATION_NUMBER_PREFIX = 'ICGVWA'
+
+def format_association_number(state_code, sequence):
+    return f"{ASSOCIATION_NUMBER_PREFIX}/{state_code}/{sequence:05d}"
+
+def max_association_sequence(state_code, numbers):
+    """Highest sequence among existing association numbers of a state"""
+    import re
+    pattern = re.compile(re.escape(f"{ASSOCIATION_NUMBER_PREFIX}/{state_code}/") + r'(\d+)$')
+    max_sequence = 0
+    for number in numbers:
+        match = pattern.match(number or '')
+        if match:
+            max_sequence = max(max_sequence, int(match.group(1)))
+    return max_sequence
+
+# Fields only the application itself writes on partial saves: flag flips,
+# allocated association numbers and derived columns. A save(update_fields=...)
+# limited to these skips full_clean() (see VeteranMember.validate_for_save).
+VETERAN_INTERNAL_UPDATE_FIELDS = frozenset({
+    'approved', 'membership', 'association_number', 'updated_at',
+    'birthday_key', 'subscription_due', 'renewal_due_date',
+})
+
+# Fields checked by VeteranMember.clean() (state ownership and service number format)
+VETERAN_CLEAN_FIELDS = frozenset({'state', 'state_id', 'created_by', 'created_by_id', 'service_number'})
+
 class VeteranMember(models.Model):
     association_id = models.AutoField(primary_key=True)
     state = models.ForeignKey(State, on_delete=models.CASCADE)
@@ -204,6 +234,7 @@ class VeteranMember(models.Model):
     )
     name = models.CharField(max_length=200)
     date_of_birth = models.DateField()
+    birthday_key = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, db_index=True, help_text='Birthday as MMDD, kept in sync with date_of_birth for indexed lookups')
     contact = models.CharField(max_length=15, validators=[validate_phone_number], help_text='10-digit mobile number')
     address = models.TextField()
     alternate_email = models.EmailField(blank=True, help_text='Secondary email address')
@@ -246,7 +277,7 @@ class VeteranMember(models.Model):
     membership = models.BooleanField(default=False, verbose_name='Active Membership')
     subscription_ref_no = models.CharField(max_length=100, blank=True, null=True, verbose_name='Subscription Ref.No', help_text='Subscription reference number (mandatory for new registrations)')
     subscription_paid_on = models.DateField(null=True, blank=True)
-    subscription_due = models.DateField(null=True, blank=True, editable=False)
+    subscription_due = models.DateField(null=True, blank=True, editable=False, db_index=True, help_text='Kept in sync with subscription_paid_on (+365 days) for indexed due/overdue lookups')
     renewal_due_date = models.DateField(null=True, blank=True, editable=False, help_text='ID card renewal due date (1 year from registration)')
     document = models.FileField(
         upload_to=get_upload_path, 
@@ -281,6 +312,17 @@ class VeteranMember(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded counter fields so signal handlers can apply
+        # MembershipStats deltas without re-reading the row
+        loaded = dict(zip(field_names, values))
+        instance._loaded_stats_values = {
+            field: loaded[field] for field in ('state_id', 'membership', 'approved', 'created_at') if field in loaded
+        }
+        return instance
+    
     def __str__(self):
         # Prefer service_number when available, fall back to Assn. Number (p_number) for legacy records
         sn = self.service_number or getattr(self, 'p_number', 'N/A')
@@ -327,23 +369,87 @@ class VeteranMember(models.Model):
                 })
 
     def save(self, *args, **kwargs):
-        # Generate association number if not exists
-        if not self.association_number:
-            self.generate_association_number()
+        # One transaction: a save that fails after allocating an association
+        # number hands the sequence value back
+        allocated = False
+        try:
+            with transaction.atomic():
+                # Generate association number if not exists
+                if not self.association_number:
+                    self.generate_association_number()
+                    allocated = bool(self.association_number)
+                
+                self.set_derived_fields()
+                update_fields = kwargs.get('update_fields')
+                if update_fields is not None:
+                    # Partial saves also write what they allocated or derived
+                    update_fields = set(update_fields)
+                    if allocated:
+                        update_fields.add('association_number')
+                    if 'date_of_birth' in update_fields:
+                        update_fields.add('birthday_key')
+                    if 'subscription_paid_on' in update_fields:
+                        update_fields.add('subscription_due')
+                    kwargs['update_fields'] = update_fields
+                
+                self.validate_for_save(kwargs.get('update_fields'))
+                return super().save(*args, **kwargs)
+        except Exception:
+            if allocated:
+                self.association_number = None
+            raise
+    
+    def validate_for_save(self, update_fields=None):
+        """Validation policy of save().
+        
+        Full saves (forms, admin, code) run full_clean(). Partial saves only
+        validate the fields they write, and run clean() and the uniqueness
+        queries only when those fields need them. Partial saves limited to
+        VETERAN_INTERNAL_UPDATE_FIELDS are not validated at all.
+        """
+        if update_fields is None:
+            self.full_clean()
+            return
         
+        fields = set(update_fields) - VETERAN_INTERNAL_UPDATE_FIELDS
+        if not fields:
+            return
+        exclude = [
+            field.name for field in self._meta.concrete_fields
+            if field.name not in fields and field.attname not in fields
+        ]
+        errors = {}
+        try:
+            self.clean_fields(exclude=exclude)
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+        if fields & VETERAN_CLEAN_FIELDS:
+            try:
+                self.clean()
+            except ValidationError as e:
+                errors = e.update_error_dict(errors)
+        try:
+            self.validate_unique(exclude=exclude)
+        except ValidationError as e:
+            errors = e.update_error_dict(errors)
+        if errors:
+            raise ValidationError(errors)
+    
+    def set_derived_fields(self):
+        """Fill the columns computed from other fields (also used before bulk_create)"""
         # Set renewal due date
         if self.association_date and not self.renewal_due_date:
             self.renewal_due_date = self.get_renewal_due_date()
         
-        # Ensure validation is always applied when saving via code or admin
-        self.full_clean()
-        return super().save(*args, **kwargs)
+        # Keep the denormalised birthday key in sync with date_of_birth
+        self.birthday_key = birthday_key_for(self.date_of_birth)
+        
+        # Likewise the subscription due date follows subscription_paid_on
+        self.subscription_due = self.get_subscription_due_date()
     
     def get_subscription_due_date(self):
         """Calculate subscription due date (365 days from subscription_paid_on)"""
-        if self.subscription_paid_on:
-            return self.subscription_paid_on + timedelta(days=365)
-        return None
+        return subscription_due_for(self.subscription_paid_on)
     
     def get_renewal_due_date(self):
         """Calculate ID card renewal due date (1 year from association_date)"""
@@ -361,36 +467,17 @@ class VeteranMember(models.Model):
     def generate_association_number(self):
         """Generate unique association number in format ICGVWA/STATE_CODE/00001
         Once allocated, this number will never be changed or reused.
+        
+        The sequence comes from the state's AssociationSequence counter, so
+        allocation is O(1) and safe when several admins add members at once.
         """
         if not self.association_number and self.state:
-            # Get the highest sequence number for this state to ensure uniqueness
-            from django.db.models import Max
-            import re
-            
-            # Find all existing association numbers for this state
-            existing_numbers = VeteranMember.objects.filter(
-                state=self.state,
-                association_number__isnull=False,
-                association_number__startswith=f"ICGVWA/{self.state.code}/"
-            ).values_list('association_number', flat=True)
-            
-            # Extract sequence numbers and find the maximum
-            max_sequence = 0
-            for number in existing_numbers:
-                match = re.search(r'ICGVWA/' + re.escape(self.state.code) + r'/(\d+)$', number)
-                if match:
-                    sequence = int(match.group(1))
-                    if sequence > max_sequence:
-                        max_sequence = sequence
-            
-            # Generate next sequence number
-            next_sequence = max_sequence + 1
-            self.association_number = f"ICGVWA/{self.state.code}/{next_sequence:05d}"
-            
-            # Ensure uniqueness by checking if this number already exists
-            while VeteranMember.objects.filter(association_number=self.association_number).exclude(pk=self.pk).exists():
-                next_sequence += 1
-                self.association_number = f"ICGVWA/{self.state.code}/{next_sequence:05d}"
+            while True:
+                number = format_association_number(self.state.code, AssociationSequence.allocate(self.state))
+                # Skip numbers that were assigned by hand (e.g. in the admin)
+                if not VeteranMember.objects.filter(association_number=number).exclude(pk=self.pk).exists():
+                    break
+            self.association_number = number
         
         return self.association_number
     
@@ -413,20 +500,12 @@ class VeteranMember(models.Model):
         }
     
     def get_subscription_status(self):
-        """Get subscription status with color coding"""
-        due_date = self.get_subscription_due_date()
-        if not due_date:
-            return {'status': 'No Payment', 'color': 'secondary'}
-        
-        today = date.today()
-        days_diff = (due_date - today).days
-        
-        if days_diff > 15:
-            return {'status': 'Active', 'color': 'success'}
-        elif days_diff >= -15:  # 15 days grace period
-            return {'status': 'Due Soon', 'color': 'warning'}
-        else:
-            return {'status': 'Overdue', 'color': 'danger'}
+        """Get subscription status with color coding.
+
+        Single-row equivalent of subscription_utils.annotate_subscription_status().
+        """
+        label, color = SUBSCRIPTION_STATUSES[classify_subscription(self.get_subscription_due_date())]
+        return {'status': label, 'color': color}
     
     def has_user_account(self):
         """Check if veteran has a user account"""
@@ -452,6 +531,96 @@ class VeteranMember(models.Model):
         }
         return info
 
+class AssociationSequence(models.Model):
+    """Last association number sequence allocated per state"""
+    state = models.OneToOneField(State, on_delete=models.CASCADE, related_name='association_sequence')
+    last_value = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.state.code}: {self.last_value}"
+    
+    @classmethod
+    def allocate(cls, state, count=1):
+        """Reserve `count` consecutive sequence values for a state and return the first.
+
+        The F() increment takes the row's write lock before the value is read
+        back, so concurrent allocations never overlap. The counter is created
+        on first use, starting after the highest existing number of the state.
+        """
+        with transaction.atomic():
+            if not cls.objects.filter(state=state).update(last_value=F('last_value') + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(state=state, last_value=cls._legacy_max(state) + count)
+                except IntegrityError:
+                    # Created concurrently: increment that row instead
+                    cls.objects.filter(state=state).update(last_value=F('last_value') + count)
+            last_value = cls.objects.filter(state=state).values_list('last_value', flat=True).get()
+        return last_value - count + 1
+    
+    @classmethod
+    def allocate_numbers(cls, state, count):
+        """Reserve `count` formatted association numbers for a state, as few ranges as possible.
+
+        Numbers already taken (assigned by hand) are skipped and replaced by
+        further values from the sequence.
+        """
+        numbers = []
+        while len(numbers) < count:
+            needed = count - len(numbers)
+            start = cls.allocate(state, needed)
+            candidates = [format_association_number(state.code, start + i) for i in range(needed)]
+            taken = set(VeteranMember.objects.filter(
+                association_number__in=candidates
+            ).values_list('association_number', flat=True))
+            numbers.extend(number for number in candidates if number not in taken)
+        return numbers
+    
+    @classmethod
+    def current_value(cls, state):
+        """Last allocated value for a state, without allocating or creating anything"""
+        last_value = cls.objects.filter(state=state).values_list('last_value', flat=True).first()
+        return cls._legacy_max(state) if last_value is None else last_value
+    
+    @classmethod
+    def _legacy_max(cls, state):
+        existing = VeteranMember.objects.filter(
+            state=state,
+            association_number__startswith=f"{ASSOCIATION_NUMBER_PREFIX}/{state.code}/"
+        ).values_list('association_number', flat=True)
+        return max_association_sequence(state.code, existing.iterator())
+
+class MembershipStats(models.Model):
+    """Materialised membership counters: one global row and one row per state.
+
+    Kept current incrementally by VeteranMember save/delete signals and
+    rebuilt with `manage.py rebuild_membership_stats`.
+    """
+    GLOBAL_SCOPE = 'all'
+    
+    scope = models.CharField(max_length=20, unique=True, help_text="'all' for the global row, 'state_<id>' for a state")
+    state = models.OneToOneField(State, on_delete=models.CASCADE, null=True, blank=True, related_name='membership_stats')
+    total_members = models.IntegerField(default=0)
+    active_members = models.IntegerField(default=0)
+    inactive_members = models.IntegerField(default=0)
+    approved_members = models.IntegerField(default=0)
+    pending_members = models.IntegerField(default=0)
+    this_month_members = models.IntegerField(default=0)
+    month = models.DateField(help_text='First day of the month this_month_members refers to')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Membership Statistics'
+        verbose_name_plural = 'Membership Statistics'
+    
+    def __str__(self):
+        return f"{self.state.name if self.state else 'All States'}: {self.total_members} members"
+    
+    @classmethod
+    def scope_for(cls, state_id=None):
+        return f"state_{state_id}" if state_id else cls.GLOBAL_SCOPE
+
 class UserState(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='state_profile')
     state = models.ForeignKey(State, on_delete=models.CASCADE)
@@ -1198,6 +1367,14 @@ class ReportConfiguration(models.Model):
     filters = models.JSONField(default=dict, help_text='Applied filters')
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     is_template = models.BooleanField(default=False, help_text='System template')
+    schedule = models.CharField(max_length=20, blank=True, default='', choices=[
+        ('', 'Not scheduled'),
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('monthly', 'Monthly'),
+    ], help_text='Precompute this report off-peak (manage.py run_scheduled_reports)')
+    next_run_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -1206,6 +1383,121 @@ class ReportConfiguration(models.Model):
     def __str__(self):
         return self.name
 
+def export_storage():
+    """Private storage for generated report exports (outside MEDIA_ROOT, never served directly)"""
+    from django.conf import settings
+    from django.core.files.storage import FileSystemStorage
+    return FileSystemStorage(location=settings.EXPORT_ROOT)
+
+class ExportJob(models.Model):
+    """Report export queued from the report builder and built in the background"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_EXPIRED, 'Expired'),
+    ]
+    
+    report_type = models.CharField(max_length=50, default='veteran', choices=[
+        ('veteran', 'Veteran Report'),
+        ('financial', 'Financial Report'),
+    ])
+    params = models.JSONField(default=dict, help_text='Validated report parameters (columns and filters)')
+    export_format = models.CharField(max_length=10, default='csv')
+    cache_key = models.CharField(max_length=100, blank=True, db_index=True, help_text='Parameter hash and data version; completed jobs with the same key are reused')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='reports/%Y/%m/', storage=export_storage, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    report_config = models.ForeignKey(ReportConfiguration, on_delete=models.SET_NULL, null=True, blank=True, related_name='export_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text='Last progress write of the running job; stale jobs are failed from this')
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Export #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        """Completion percentage (0-100)"""
+        if self.status == self.STATUS_COMPLETED:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(int(self.processed_rows * 100 / self.total_rows), 99)
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED, self.STATUS_EXPIRED)
+    
+    @property
+    def is_downloadable(self):
+        return (
+            self.status == self.STATUS_COMPLETED and bool(self.file)
+            and (self.expires_at is None or self.expires_at > timezone.now())
+        )
+
+class ImportJob(models.Model):
+    """Spreadsheet of members uploaded by a state admin and imported in the background"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    state = models.ForeignKey(State, on_delete=models.CASCADE, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/%Y/%m/', storage=export_storage, blank=True, help_text='Uploaded spreadsheet; removed once the import has run')
+    original_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True, help_text='Per-row validation errors: [{"row": n, "field": ..., "message": ...}]')
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='import_jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text='Last progress write of the running job; stale jobs are failed from this')
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Import #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        """Completion percentage (0-100)"""
+        if self.status == self.STATUS_COMPLETED:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(int(self.processed_rows * 100 / self.total_rows), 99)
+    
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+
 # GALLERY MODELS
 class GalleryImage(models.Model):
     """Gallery images for veterans and events"""
@@ -1,9 +1,21 @@
+import time
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import caches
 from django.core.exceptions import PermissionDenied
 from django.shortcuts import get_object_or_404
 from functools import wraps
 from .models import Role, Permission, UserRole, RoleAuditLog
 
+# Effective permission sets are cached per user under two versions kept in
+# the shared cache: one for all roles (bumped on role/permission edits) and
+# one per user (bumped on assign_role/revoke_role)
+RBAC_VERSION_KEY = 'rbac_version'
+RBAC_LOCAL_CACHE_SIZE = 1000
+
+# (user_id, roles version, user version) -> frozenset of codenames, per process
+_local_permissions = {}
+
 def get_client_ip(request):
     """Get client IP address from request"""
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -26,27 +38,72 @@ def log_rbac_action(action, user, target_user=None, role=None, permission=None,
         ip_address=ip_address
     )
 
+def _rbac_cache():
+    return caches[getattr(settings, 'RBAC_CACHE_ALIAS', 'default')]
+
+def _user_version_key(user_id):
+    return f"rbac_version:{user_id}"
+
+def _rbac_versions(user_id):
+    """(roles version, user version); missing versions are replaced by new ones"""
+    cache = _rbac_cache()
+    keys = [RBAC_VERSION_KEY, _user_version_key(user_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if versions.get(key) is None:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return versions[keys[0]], versions[keys[1]]
+
+def invalidate_user_permissions(user_id):
+    """Drop the cached permission set of one user (role assigned or revoked)"""
+    _rbac_cache().set(_user_version_key(user_id), time.time_ns(), None)
+
+def invalidate_all_permissions():
+    """Drop every cached permission set (role, permission or role-permission edit)"""
+    _rbac_cache().set(RBAC_VERSION_KEY, time.time_ns(), None)
+
+def load_user_permission_codenames(user_id):
+    """Codenames granted by the user's active roles, in one JOIN query"""
+    return frozenset(Permission.objects.filter(
+        is_active=True,
+        role__is_active=True,
+        role__role_assignments__user_id=user_id,
+        role__role_assignments__is_active=True
+    ).values_list('codename', flat=True).distinct())
+
+def get_user_permission_codenames(user):
+    """Effective permission codenames of a (non-superuser) user.
+
+    Looked up on the user object (same request), then in process memory,
+    then in the shared cache, and only then in the database. Every level is
+    keyed by the current versions, so invalidation reaches all processes.
+    """
+    cached = getattr(user, '_rbac_permissions', None)
+    if cached is not None:
+        return cached
+    
+    key = (user.pk,) + _rbac_versions(user.pk)
+    codenames = _local_permissions.get(key)
+    if codenames is None:
+        shared_key = 'rbac_permissions:%s:%s:%s' % key
+        codenames = _rbac_cache().get(shared_key)
+        if codenames is None:
+            codenames = load_user_permission_codenames(user.pk)
+            _rbac_cache().set(shared_key, codenames)
+        if len(_local_permissions) >= RBAC_LOCAL_CACHE_SIZE:
+            _local_permissions.clear()
+        _local_permissions[key] = codenames
+    
+    user._rbac_permissions = codenames
+    return codenames
+
 def has_permission(user, permission_codename):
     """Check if user has specific permission through their roles"""
     if user.is_superuser:
         return True
     
-    # Get all active roles for the user
-    user_roles = UserRole.objects.filter(
-        user=user, 
-        is_active=True, 
-        role__is_active=True
-    ).select_related('role')
-    
-    # Check if any role has the required permission
-    for user_role in user_roles:
-        if user_role.role.permissions.filter(
-            codename=permission_codename, 
-            is_active=True
-        ).exists():
-            return True
-    
-    return False
+    return permission_codename in get_user_permission_codenames(user)
 
 def has_role(user, role_name):
     """Check if user has specific role"""
@@ -65,19 +122,7 @@ def get_user_permissions(user):
     if user.is_superuser:
         return Permission.objects.filter(is_active=True)
     
-    user_roles = UserRole.objects.filter(
-        user=user,
-        is_active=True,
-        role__is_active=True
-    ).select_related('role')
-    
-    permission_ids = []
-    for user_role in user_roles:
-        permission_ids.extend(
-            user_role.role.permissions.filter(is_active=True).values_list('id', flat=True)
-        )
-    
-    return Permission.objects.filter(id__in=permission_ids)
+    return Permission.objects.filter(codename__in=get_user_permission_codenames(user))
 
 def get_user_roles(user):
     """Get all active roles for a user"""
@@ -0,0 +1,268 @@
+"""Custom report builder: parameter validation, querysets, rows and result caching"""
+import hashlib
+import json
+from datetime import datetime
+from operator import itemgetter
+from django.core.exceptions import ValidationError
+from django.http import QueryDict
+
+# Date fields the report builder may filter on
+REPORT_DATE_FIELDS = (
+    'date_of_birth', 'date_of_joining', 'retired_on', 'enrolled_date',
+    'subscription_paid_on', 'created_at',
+)
+
+# Report builder form fields stored in ReportConfiguration.filters
+REPORT_FILTER_FIELDS = (
+    'state_filter', 'membership_filter', 'approval_filter',
+    'date_field', 'from_date', 'to_date', 'export_format',
+)
+
+
+def _parse_date(value, label):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValidationError(f'{label} is not a valid date.')
+
+
+def report_filters_from_post(data):
+    """Non-empty report builder filter fields from submitted form data"""
+    return {field: data.get(field) for field in REPORT_FILTER_FIELDS if data.get(field)}
+
+
+def report_columns_from_post(data):
+    """Selected columns; the save dialog posts them as one comma-separated value"""
+    columns = []
+    for value in data.getlist('columns'):
+        columns.extend(col for col in value.split(',') if col)
+    return columns
+
+
+def report_config_form_data(config):
+    """Rebuild report builder form data from a saved ReportConfiguration"""
+    data = QueryDict(mutable=True)
+    data.setlist('columns', config.selected_columns)
+    for field, value in (config.filters or {}).items():
+        if field in REPORT_FILTER_FIELDS:
+            data[field] = value
+    return data
+
+
+def veteran_report_params(data, user):
+    """Validate report builder form data and return JSON-serialisable parameters.
+
+    Non-superusers are scoped to their own state here, so the parameters can
+    be replayed later (e.g. by a background export job) without the request.
+    Raises ValidationError with a user-facing message.
+    """
+    selected_columns = report_columns_from_post(data)
+    if not selected_columns:
+        raise ValidationError('Please select at least one column.')
+
+    from_date = data.get('from_date')
+    to_date = data.get('to_date')
+    date_field = data.get('date_field')
+
+    # Validate dates don't exceed today
+    today = datetime.now().date()
+    if from_date and _parse_date(from_date, 'From Date') > today:
+        raise ValidationError('From Date cannot be a future date.')
+    if to_date and _parse_date(to_date, 'To Date') > today:
+        raise ValidationError('To Date cannot be a future date.')
+    if from_date and to_date and from_date > to_date:
+        raise ValidationError('From Date cannot be later than To Date.')
+    if date_field and date_field not in REPORT_DATE_FIELDS:
+        raise ValidationError('Invalid date field.')
+
+    state_id = None
+    if not user.is_superuser:
+        try:
+            state_id = user.state_profile.state_id
+        except Exception:
+            pass
+    elif data.get('state_filter'):
+        state_id = data.get('state_filter')
+
+    return {
+        'columns': selected_columns,
+        'state_id': int(state_id) if state_id else None,
+        'date_field': date_field or '',
+        'from_date': from_date or '',
+        'to_date': to_date or '',
+        'membership': data.get('membership_filter', ''),
+        'approved': data.get('approval_filter', ''),
+    }
+
+
+def report_data_version(state_id=None):
+    """Data version of the members in scope (one state, or all states).
+
+    Derived from the member count and the latest updated_at, so any save,
+    create or delete changes it. Read from the database, it is the same for
+    every process (web workers, export worker, scheduler).
+    """
+    from django.db.models import Count, Max
+    from .models import VeteranMember
+
+    members = VeteranMember.objects.all()
+    if state_id:
+        members = members.filter(state_id=state_id)
+    version = members.aggregate(count=Count('pk'), latest=Max('updated_at'))
+    latest = version['latest'].timestamp() if version['latest'] else 0
+    return f"{version['count']}-{latest:.6f}"
+
+
+def report_cache_key(report_type, params, export_format):
+    """Result cache key: hash of the validated parameters plus the data version in scope.
+
+    Only veteran reports are cached; other report types get an empty key.
+    """
+    if report_type != 'veteran':
+        return ''
+    payload = json.dumps([report_type, params, export_format], sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:32]
+    return f"{digest}:{report_data_version(params.get('state_id'))}"
+
+
+def veteran_report_queryset(params):
+    """VeteranMember queryset matching validated report parameters"""
+    from .models import VeteranMember
+
+    queryset = VeteranMember.objects.all()
+    if params.get('state_id'):
+        queryset = queryset.filter(state_id=params['state_id'])
+
+    date_field = params.get('date_field')
+    if params.get('from_date') and params.get('to_date') and date_field in REPORT_DATE_FIELDS:
+        queryset = queryset.filter(**{f"{date_field}__range": [params['from_date'], params['to_date']]})
+
+    if params.get('membership'):
+        queryset = queryset.filter(membership=(params['membership'] == 'true'))
+
+    if params.get('approved'):
+        queryset = queryset.filter(approved=(params['approved'] == 'true'))
+
+    return queryset
+
+
+def veteran_report_header(columns):
+    return [col.replace('_', ' ').title() for col in columns]
+
+
+def _plain(value):
+    return value if value else ''
+
+
+def _name_or_text(name, text):
+    return name or text or ''
+
+
+# Report columns that are not a plain model field: column -> (lookups, formatter).
+# The formatter receives the looked-up values in order.
+SPECIAL_REPORT_COLUMNS = {
+    'state': (('state__name',), lambda name: name),
+    'rank': (('rank__name',), lambda name: name),
+    'branch': (('branch__name',), lambda name: name),
+    'blood_group': (('blood_group__name',), lambda name: name),
+    'medical_category': (('medical_category__name', 'medical_category_text'), _name_or_text),
+    'nearest_echs': (('nearest_echs__name', 'nearest_echs_text'), _name_or_text),
+    'nearest_dhq': (('nearest_dhq_text',), lambda text: text or ''),
+    'membership': (('membership',), lambda active: 'Active' if active else 'Inactive'),
+    'approved': (('approved',), lambda approved: 'Approved' if approved else 'Pending'),
+}
+
+
+def compile_veteran_report(columns):
+    """Compile selected columns into (lookups, row_formatter).
+
+    lookups is the values_list() projection: only the selected fields plus
+    the joins they need. row_formatter turns one values_list tuple into the
+    report row using per-column formatters resolved once, up front.
+    Unknown columns produce empty cells.
+    """
+    from .models import VeteranMember
+
+    concrete = {
+        field.name for field in VeteranMember._meta.concrete_fields
+        if not field.is_relation
+    }
+    lookups = []
+    positions = {}
+
+    def position(lookup):
+        if lookup not in positions:
+            positions[lookup] = len(lookups)
+            lookups.append(lookup)
+        return positions[lookup]
+
+    cell_formatters = []
+    for col in columns:
+        if col in SPECIAL_REPORT_COLUMNS:
+            col_lookups, formatter = SPECIAL_REPORT_COLUMNS[col]
+            getter = itemgetter(*[position(lookup) for lookup in col_lookups])
+            if len(col_lookups) == 1:
+                cell_formatters.append(lambda row, get=getter, fmt=formatter: fmt(get(row)))
+            else:
+                cell_formatters.append(lambda row, get=getter, fmt=formatter: fmt(*get(row)))
+        elif col in concrete:
+            getter = itemgetter(position(col))
+            cell_formatters.append(lambda row, get=getter: _plain(get(row)))
+        else:
+            cell_formatters.append(lambda row: '')
+
+    def format_row(row):
+        return [format_cell(row) for format_cell in cell_formatters]
+
+    return lookups, format_row
+
+
+# Model field class -> column type hint used by typed export formats (Parquet)
+FIELD_COLUMN_TYPES = {
+    'AutoField': 'int', 'BigAutoField': 'int', 'IntegerField': 'int', 'BigIntegerField': 'int',
+    'SmallIntegerField': 'int', 'PositiveIntegerField': 'int', 'PositiveSmallIntegerField': 'int',
+    'BooleanField': 'bool', 'DateField': 'date', 'DateTimeField': 'datetime',
+    'FloatField': 'float', 'DecimalField': 'float',
+}
+
+
+def veteran_report_column_types(columns):
+    """Return a (type, nullable) hint per column: type is int, bool, date, datetime, float or string"""
+    from django.core.exceptions import FieldDoesNotExist
+    from .models import VeteranMember
+
+    types = []
+    for col in columns:
+        if col in SPECIAL_REPORT_COLUMNS:
+            types.append(('string', False))
+            continue
+        try:
+            field = VeteranMember._meta.get_field(col)
+        except FieldDoesNotExist:
+            types.append(('string', False))
+            continue
+        column_type = 'string' if field.is_relation else FIELD_COLUMN_TYPES.get(field.get_internal_type(), 'string')
+        types.append((column_type, field.null))
+    return types
+
+
+def build_veteran_report(params, chunk_size=2000):
+    """Return (header, total_rows, rows, column_types) for a veteran report; rows is a generator.
+
+    Rows come straight from a values_list() projection of the selected
+    columns, so no model instances are built.
+    """
+    columns = params['columns']
+    lookups, format_row = compile_veteran_report(columns)
+    queryset = veteran_report_queryset(params)
+    total_rows = queryset.count()
+
+    def rows():
+        if not lookups:
+            for _ in range(total_rows):
+                yield format_row(())
+            return
+        for values in queryset.values_list(*lookups).iterator(chunk_size=chunk_size):
+            yield format_row(values)
+
+    return veteran_report_header(columns), total_rows, rows(), veteran_report_column_types(columns)
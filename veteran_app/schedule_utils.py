@@ -0,0 +1,164 @@
+"""Scheduled report generation (see ReportConfiguration.schedule)"""
+import logging
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# ReportConfiguration.schedule -> FinancialReport.report_type
+FINANCIAL_REPORT_TYPES = {'daily': 'custom', 'weekly': 'custom', 'monthly': 'monthly'}
+
+
+def _at_schedule_hour(day):
+    hour = getattr(settings, 'REPORT_SCHEDULE_HOUR', 2)
+    return timezone.make_aware(datetime.combine(day, time(hour=hour)))
+
+
+def next_scheduled_run(schedule, now=None):
+    """Next off-peak run time after `now` for a schedule.
+
+    Daily runs every night, weekly on Monday night and monthly on the
+    night of the 1st, all at REPORT_SCHEDULE_HOUR local time.
+    """
+    if not schedule:
+        return None
+    now = now or timezone.now()
+    today = timezone.localtime(now).date()
+
+    if schedule == 'daily':
+        candidates = (today, today + timedelta(days=1))
+    elif schedule == 'weekly':
+        monday = today - timedelta(days=today.weekday())
+        candidates = (monday, monday + timedelta(days=7))
+    elif schedule == 'monthly':
+        first = today.replace(day=1)
+        candidates = (first, (first + timedelta(days=32)).replace(day=1))
+    else:
+        raise ValueError(f"Unknown report schedule: {schedule}")
+
+    for day in candidates:
+        run_at = _at_schedule_hour(day)
+        if run_at > now:
+            return run_at
+    return _at_schedule_hour(candidates[-1])
+
+
+def financial_report_period(schedule, run_date):
+    """(start_date, end_date) of the last complete period before run_date"""
+    if schedule == 'daily':
+        day = run_date - timedelta(days=1)
+        return day, day
+    if schedule == 'weekly':
+        end = run_date - timedelta(days=run_date.weekday() + 1)
+        return end - timedelta(days=6), end
+    last_month_end = run_date.replace(day=1) - timedelta(days=1)
+    return last_month_end.replace(day=1), last_month_end
+
+
+def _scheduled_exports(config, run_date):
+    """(params, export_format) pairs a scheduled configuration produces"""
+    from .models import State
+    from .report_utils import report_config_form_data, veteran_report_params
+
+    data = report_config_form_data(config)
+    export_format = data.get('export_format', 'csv')
+
+    if config.report_type == 'financial':
+        start_date, end_date = financial_report_period(config.schedule, run_date)
+        return [({'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}, export_format)]
+
+    if not config.is_template:
+        return [(veteran_report_params(data, config.created_by), export_format)]
+
+    # Templates are run by every state admin for their own state: precompute
+    # each state (parameters match what those users submit) plus all states.
+    exports = []
+    for state_id in [None] + list(State.objects.values_list('id', flat=True)):
+        state_data = data.copy()
+        state_data['state_filter'] = str(state_id) if state_id else ''
+        params = veteran_report_params(state_data, config.created_by)
+        params['state_id'] = state_id
+        exports.append((params, export_format))
+    return exports
+
+
+def _record_financial_report(config, job):
+    """Store a completed financial export as a FinancialReport"""
+    from .export_utils import ledger_totals
+    from .models import FinancialReport, Transaction
+
+    start_date = job.params['start_date']
+    end_date = job.params['end_date']
+    totals = ledger_totals(Transaction.objects.filter(created_at__date__range=[start_date, end_date]))
+    report = FinancialReport(
+        report_type=FINANCIAL_REPORT_TYPES.get(config.schedule, 'custom'),
+        title=f"{config.name} ({start_date} to {end_date})",
+        start_date=start_date,
+        end_date=end_date,
+        total_income=totals['income'],
+        total_expenses=totals['expenses'],
+        net_balance=totals['net'],
+        generated_by=config.created_by
+    )
+    with job.file.open('rb') as fh:
+        report.report_file.save(job.file.name.rsplit('/', 1)[-1], fh, save=False)
+    report.save()
+    return report
+
+
+def run_scheduled_reports(now=None):
+    """Run every scheduled configuration that is due. Returns the number of configurations run.
+
+    Jobs are built inline (not handed to the web process); their files stay
+    downloadable until the configuration's next run.
+    """
+    from .export_utils import enqueue_export, run_export_job
+    from .models import ExportJob, ReportConfiguration
+
+    now = now or timezone.now()
+    run_date = timezone.localtime(now).date()
+    ttl = timedelta(hours=getattr(settings, 'EXPORT_JOB_TTL_HOURS', 24))
+    due = ReportConfiguration.objects.exclude(schedule='').filter(
+        Q(next_run_at__lte=now) | Q(next_run_at__isnull=True)
+    ).select_related('created_by')
+
+    ran = 0
+    for config in due:
+        next_run_at = next_scheduled_run(config.schedule, now)
+        try:
+            exports = _scheduled_exports(config, run_date)
+        except Exception:
+            logger.exception('Scheduled report %s could not be prepared', config.pk)
+            exports = []
+
+        for params, export_format in exports:
+            job = enqueue_export(config.created_by, config.report_type, params, export_format,
+                                 report_config=config, dispatch=False)
+            if job.status == ExportJob.STATUS_PENDING:
+                started_at = timezone.now()
+                claimed = ExportJob.objects.filter(pk=job.pk, status=ExportJob.STATUS_PENDING).update(
+                    status=ExportJob.STATUS_RUNNING,
+                    started_at=started_at,
+                    heartbeat_at=started_at
+                )
+                if not claimed:
+                    continue
+                job.refresh_from_db()
+                run_export_job(job)
+            if job.status != ExportJob.STATUS_COMPLETED:
+                continue
+
+            # Keep the artifact until the next run has replaced it
+            ExportJob.objects.filter(file=job.file.name, status=ExportJob.STATUS_COMPLETED).update(
+                expires_at=next_run_at + ttl
+            )
+            if config.report_type == 'financial':
+                _record_financial_report(config, job)
+
+        config.last_run_at = now
+        config.next_run_at = next_run_at
+        config.save(update_fields=['last_run_at', 'next_run_at'])
+        ran += 1
+    return ran
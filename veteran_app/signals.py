@@ -1,7 +1,15 @@
-from django.db.models.signals import post_save
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import State, VeteranMember, VeteranUser, Rank, Group, BloodGroup
+from .models import (State, VeteranMember, VeteranUser, UserState, AccountsUser, Rank, Group, BloodGroup,
+                     Permission, Role, UserRole)
+from .birthday_utils import invalidate_birthday_cache
+from .identity_utils import invalidate_identity
+from .rbac_utils import invalidate_all_permissions, invalidate_user_permissions
+from .stats_utils import apply_member_change, invalidate_membership_stats
+from .subscription_utils import invalidate_subscription_due_lists
 from datetime import date
 import random
 
@@ -80,4 +88,103 @@ def setup_state_chat_functionality(sender, instance, created, **kwargs):
                     'approved': True,
                     'created_by_admin': True
                 }
-            )
\ No newline at end of file
+            )
+
+@receiver(post_save, sender=VeteranMember)
+@receiver(post_delete, sender=VeteranMember)
+def invalidate_todays_birthdays(sender, instance, **kwargs):
+    """Drop the cached birthday list when a member is added, edited, approved or removed"""
+    # After commit, so no other process re-caches the list from the old rows
+    transaction.on_commit(invalidate_birthday_cache)
+
+@receiver(post_save, sender=VeteranMember)
+@receiver(post_delete, sender=VeteranMember)
+def invalidate_subscription_due(sender, instance, **kwargs):
+    """Drop the cached due/overdue lists when a member's subscription may have changed"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'subscription_paid_on' not in update_fields:
+        return
+    transaction.on_commit(invalidate_subscription_due_lists)
+
+
+MEMBERSHIP_STATS_FIELDS = ('state_id', 'membership', 'approved', 'created_at')
+
+def _loaded_stats_values(instance):
+    """Stats fields as last read from / written to the database, or None if unknown"""
+    values = getattr(instance, '_loaded_stats_values', None)
+    if values is None or len(values) < len(MEMBERSHIP_STATS_FIELDS):
+        return None
+    return values
+
+@receiver(post_save, sender=VeteranMember)
+def invalidate_member_identity(sender, instance, created, update_fields=None, **kwargs):
+    """A member moved to another state: its veteran login's identity changes.
+
+    Connected before update_membership_stats, which replaces the loaded values.
+    """
+    if created or (update_fields is not None and not {'state', 'state_id'} & set(update_fields)):
+        return
+    old_values = _loaded_stats_values(instance)
+    if old_values is not None and old_values['state_id'] == instance.state_id:
+        return
+    for user_id in VeteranUser.objects.filter(veteran_member_id=instance.pk).values_list('user_id', flat=True):
+        transaction.on_commit(partial(invalidate_identity, user_id))
+
+@receiver(post_save, sender=VeteranMember)
+def update_membership_stats(sender, instance, created, update_fields=None, **kwargs):
+    """Keep MembershipStats current with an incremental delta per saved member"""
+    if update_fields is not None and not {'state', 'state_id', 'membership', 'approved'} & set(update_fields):
+        return
+    
+    old_values = None if created else _loaded_stats_values(instance)
+    if not created and (old_values is None or instance.get_deferred_fields() & {'state_id', 'membership', 'approved'}):
+        # Previous values unknown: let the affected rows be rebuilt on next read
+        invalidate_membership_stats(instance.state_id, (old_values or {}).get('state_id'))
+    else:
+        new_values = {field: getattr(instance, field) for field in MEMBERSHIP_STATS_FIELDS}
+        apply_member_change(old_values, new_values)
+        instance._loaded_stats_values = new_values
+
+@receiver(post_delete, sender=VeteranMember)
+def remove_from_membership_stats(sender, instance, **kwargs):
+    """Subtract a deleted member from MembershipStats"""
+    old_values = _loaded_stats_values(instance)
+    if old_values is None:
+        invalidate_membership_stats(instance.state_id)
+    else:
+        apply_member_change(old_values, None)
+
+
+# Identity and permission versions are bumped after commit: bumped earlier,
+# another process could read the new version, load the old rows and cache
+# them under it.
+@receiver(post_save, sender=UserState)
+@receiver(post_delete, sender=UserState)
+@receiver(post_save, sender=AccountsUser)
+@receiver(post_delete, sender=AccountsUser)
+@receiver(post_save, sender=VeteranUser)
+@receiver(post_delete, sender=VeteranUser)
+def invalidate_profile_identity(sender, instance, **kwargs):
+    """Re-resolve request.identity of a user whose profile was added, edited or removed"""
+    transaction.on_commit(partial(invalidate_identity, instance.user_id))
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def invalidate_user_role_permissions(sender, instance, **kwargs):
+    """assign_role/revoke_role (or any assignment edit) changes one user's permission set"""
+    transaction.on_commit(partial(invalidate_user_permissions, instance.user_id))
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_role_permissions(sender, instance, **kwargs):
+    """Role or permission edits may change any user's permission set"""
+    transaction.on_commit(invalidate_all_permissions)
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_role_permission_edits(sender, action, **kwargs):
+    """Permissions added to or removed from a role"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_all_permissions)
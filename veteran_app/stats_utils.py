@@ -0,0 +1,182 @@
+"""Membership statistics rollup helpers (see MembershipStats)"""
+from datetime import datetime, time
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+COUNTER_FIELDS = [
+    'total_members', 'active_members', 'inactive_members',
+    'approved_members', 'pending_members', 'this_month_members',
+]
+
+
+def current_month_start():
+    """First day of the current month (local time)"""
+    return timezone.localdate().replace(day=1)
+
+
+def _month_start_datetime(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def _counter_aggregates(month):
+    """Count() expressions computing every counter in one pass"""
+    return {
+        'total_members': Count('pk'),
+        'active_members': Count('pk', filter=Q(membership=True)),
+        'inactive_members': Count('pk', filter=Q(membership=False)),
+        'approved_members': Count('pk', filter=Q(approved=True)),
+        'pending_members': Count('pk', filter=Q(approved=False)),
+        'this_month_members': Count('pk', filter=Q(created_at__gte=_month_start_datetime(month))),
+    }
+
+
+def member_stats(queryset=None, month=None):
+    """Return every membership counter for a VeteranMember queryset in one aggregate query.
+
+    `month` is the first day of the month counted by this_month_members
+    (defaults to the current month).
+    """
+    from .models import VeteranMember
+
+    if queryset is None:
+        queryset = VeteranMember.objects.all()
+    return queryset.aggregate(**_counter_aggregates(month or current_month_start()))
+
+
+def member_stats_by_state(queryset=None, month=None, include_empty=True):
+    """Return {state_id: counters} for every state in one grouped query.
+
+    States without members get zero counters unless include_empty is False.
+    """
+    from .models import State, VeteranMember
+
+    if queryset is None:
+        queryset = VeteranMember.objects.all()
+    rows = queryset.order_by().values('state_id').annotate(**_counter_aggregates(month or current_month_start()))
+    stats = {row.pop('state_id'): row for row in rows}
+    if include_empty:
+        for state_id in State.objects.values_list('id', flat=True):
+            stats.setdefault(state_id, dict.fromkeys(COUNTER_FIELDS, 0))
+    return stats
+
+
+def _save_stats(state_id, month, counters):
+    from .models import MembershipStats
+
+    stats, _ = MembershipStats.objects.update_or_create(
+        scope=MembershipStats.scope_for(state_id),
+        defaults=dict(counters, state_id=state_id, month=month)
+    )
+    return stats
+
+
+def refresh_membership_stats(state_id=None):
+    """Recompute one rollup row (global when state_id is None) from VeteranMember"""
+    from .models import VeteranMember
+
+    month = current_month_start()
+    members = VeteranMember.objects.all()
+    if state_id:
+        members = members.filter(state_id=state_id)
+    return _save_stats(state_id, month, member_stats(members, month))
+
+
+def rebuild_membership_stats():
+    """Recompute every rollup row with a single grouped query. Returns rows written."""
+    month = current_month_start()
+    totals = dict.fromkeys(COUNTER_FIELDS, 0)
+    per_state = member_stats_by_state(month=month)
+    for state_id, counters in per_state.items():
+        for field in COUNTER_FIELDS:
+            totals[field] += counters[field]
+        _save_stats(state_id, month, counters)
+    _save_stats(None, month, totals)
+    return len(per_state) + 1
+
+
+def get_membership_stats(state=None):
+    """Return the counters for a state (or all states) as a dict.
+
+    Reads one rollup row; a missing row or one from a previous month is
+    recomputed on the fly.
+    """
+    from .models import MembershipStats
+
+    state_id = state.pk if state is not None else None
+    stats = MembershipStats.objects.filter(
+        scope=MembershipStats.scope_for(state_id),
+        month=current_month_start()
+    ).first()
+    if stats is None:
+        stats = refresh_membership_stats(state_id)
+    return {field: getattr(stats, field) for field in COUNTER_FIELDS}
+
+
+def _member_counters(values, month):
+    """Counter contribution of a single member given its stats fields"""
+    created_at = values.get('created_at')
+    return {
+        'total_members': 1,
+        'active_members': int(bool(values['membership'])),
+        'inactive_members': int(not values['membership']),
+        'approved_members': int(bool(values['approved'])),
+        'pending_members': int(not values['approved']),
+        'this_month_members': int(created_at is not None and created_at >= _month_start_datetime(month)),
+    }
+
+
+def _apply_delta(state_id, delta, month):
+    """Add delta to a rollup row with F() expressions.
+
+    A missing row, or one left over from a previous month, is not touched:
+    get_membership_stats() recomputes it on the next read.
+    """
+    from .models import MembershipStats
+
+    changes = {field: F(field) + value for field, value in delta.items() if value}
+    if changes:
+        MembershipStats.objects.filter(
+            scope=MembershipStats.scope_for(state_id),
+            month=month
+        ).update(**changes)
+
+
+def invalidate_membership_stats(*state_ids):
+    """Drop the global row and the given state rows; they are rebuilt on next read"""
+    from .models import MembershipStats
+
+    scopes = [MembershipStats.scope_for(None)] + [MembershipStats.scope_for(state_id) for state_id in state_ids if state_id]
+    MembershipStats.objects.filter(scope__in=scopes).delete()
+
+
+def _add(delta, counters, sign):
+    for field, value in counters.items():
+        delta[field] = delta.get(field, 0) + sign * value
+
+
+def apply_member_change(old_values, new_values):
+    """Apply the counter delta of a member moving from old_values to new_values.
+
+    Either side may be None (member created / deleted). Values are dicts
+    with state_id, membership, approved and created_at.
+    """
+    month = current_month_start()
+    old = _member_counters(old_values, month) if old_values else {}
+    new = _member_counters(new_values, month) if new_values else {}
+
+    global_delta = {}
+    _add(global_delta, old, -1)
+    _add(global_delta, new, 1)
+    _apply_delta(None, global_delta, month)
+
+    old_state = old_values['state_id'] if old_values else None
+    new_state = new_values['state_id'] if new_values else None
+    if old_state == new_state:
+        _apply_delta(new_state, global_delta, month)
+    else:
+        if old_state:
+            state_delta = {}
+            _add(state_delta, old, -1)
+            _apply_delta(old_state, state_delta, month)
+        if new_state:
+            _apply_delta(new_state, new, month)
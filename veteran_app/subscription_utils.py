@@ -0,0 +1,183 @@
+"""Subscription status classification shared by model methods and querysets"""
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+SUBSCRIPTION_PERIOD_DAYS = 365
+SUBSCRIPTION_GRACE_DAYS = 15
+
+SUBSCRIPTION_ACTIVE = 'active'
+SUBSCRIPTION_DUE_SOON = 'due_soon'
+SUBSCRIPTION_OVERDUE = 'overdue'
+SUBSCRIPTION_NO_PAYMENT = 'no_payment'
+
+# status key -> (label, bootstrap colour)
+SUBSCRIPTION_STATUSES = {
+    SUBSCRIPTION_ACTIVE: ('Active', 'success'),
+    SUBSCRIPTION_DUE_SOON: ('Due Soon', 'warning'),
+    SUBSCRIPTION_OVERDUE: ('Overdue', 'danger'),
+    SUBSCRIPTION_NO_PAYMENT: ('No Payment', 'secondary'),
+}
+
+SUBSCRIPTION_DUE_LISTS_CACHE_PREFIX = 'subscription_due_lists'
+
+
+def subscription_due_for(paid_on):
+    """Due date of a subscription paid on paid_on (None if never paid)"""
+    if paid_on:
+        return paid_on + timedelta(days=SUBSCRIPTION_PERIOD_DAYS)
+    return None
+
+
+def classify_subscription(due_date, today=None):
+    """Return the status key for a subscription due on due_date.
+
+    Due Soon covers 15 days either side of the due date (grace period).
+    """
+    if not due_date:
+        return SUBSCRIPTION_NO_PAYMENT
+    days_diff = (due_date - (today or date.today())).days
+    if days_diff > SUBSCRIPTION_GRACE_DAYS:
+        return SUBSCRIPTION_ACTIVE
+    if days_diff >= -SUBSCRIPTION_GRACE_DAYS:
+        return SUBSCRIPTION_DUE_SOON
+    return SUBSCRIPTION_OVERDUE
+
+
+def subscription_status_q(status, today=None):
+    """Q object selecting members in the given status.
+
+    The same boundaries as classify_subscription(), expressed as plain
+    ranges on the indexed subscription_due column.
+    """
+    today = today or date.today()
+    due_soon_from = today - timedelta(days=SUBSCRIPTION_GRACE_DAYS)
+    due_soon_until = today + timedelta(days=SUBSCRIPTION_GRACE_DAYS)
+
+    if status == SUBSCRIPTION_ACTIVE:
+        return Q(subscription_due__gt=due_soon_until)
+    if status == SUBSCRIPTION_DUE_SOON:
+        return Q(subscription_due__range=(due_soon_from, due_soon_until))
+    if status == SUBSCRIPTION_OVERDUE:
+        return Q(subscription_due__lt=due_soon_from)
+    if status == SUBSCRIPTION_NO_PAYMENT:
+        return Q(subscription_due__isnull=True)
+    raise ValueError(f"Unknown subscription status: {status}")
+
+
+def subscription_status_expression(today=None):
+    """Case/When expression evaluating to the status key of each row"""
+    return Case(
+        *[When(subscription_status_q(status, today), then=Value(status))
+          for status in (SUBSCRIPTION_ACTIVE, SUBSCRIPTION_DUE_SOON, SUBSCRIPTION_OVERDUE)],
+        default=Value(SUBSCRIPTION_NO_PAYMENT),
+        output_field=CharField()
+    )
+
+
+def annotate_subscription_status(queryset, today=None):
+    """Annotate a VeteranMember queryset with subscription_status"""
+    return queryset.annotate(subscription_status=subscription_status_expression(today))
+
+
+def filter_subscription_status(queryset, status, today=None):
+    """Restrict a VeteranMember queryset to one subscription status"""
+    return queryset.filter(subscription_status_q(status, today))
+
+
+def subscription_status_counts(queryset=None, today=None):
+    """Return {status key: count} for a VeteranMember queryset in one GROUP BY query"""
+    from .models import VeteranMember
+
+    if queryset is None:
+        queryset = VeteranMember.objects.all()
+    counts = dict.fromkeys(SUBSCRIPTION_STATUSES, 0)
+    rows = annotate_subscription_status(queryset.order_by(), today).values(
+        'subscription_status'
+    ).annotate(count=Count('pk'))
+    for row in rows:
+        counts[row['subscription_status']] = row['count']
+    return counts
+
+
+def sync_subscription_due(batch_size=500):
+    """Recompute subscription_due where it drifted from subscription_paid_on.
+
+    save() keeps the column current; this catches rows written with
+    queryset.update() or raw SQL. Returns the number of rows fixed.
+    """
+    from .models import VeteranMember
+
+    stale = []
+    fixed = 0
+    members = VeteranMember.objects.only('pk', 'subscription_paid_on', 'subscription_due')
+    for member in members.iterator(chunk_size=batch_size):
+        due = subscription_due_for(member.subscription_paid_on)
+        if member.subscription_due != due:
+            member.subscription_due = due
+            stale.append(member)
+        if len(stale) >= batch_size:
+            VeteranMember.objects.bulk_update(stale, ['subscription_due'])
+            fixed += len(stale)
+            stale = []
+    if stale:
+        VeteranMember.objects.bulk_update(stale, ['subscription_due'])
+        fixed += len(stale)
+    return fixed
+
+
+def _due_lists_cache():
+    # Shared by all processes: the nightly command fills it for the web workers
+    return caches[getattr(settings, 'SUBSCRIPTION_CACHE_ALIAS', 'default')]
+
+
+def _due_lists_cache_key(day):
+    return f"{SUBSCRIPTION_DUE_LISTS_CACHE_PREFIX}_{day.isoformat()}"
+
+
+def compute_subscription_due_lists(today=None):
+    """Compute and cache the Due Soon and Overdue member id lists for a day.
+
+    Two range scans on subscription_due; run nightly by
+    `manage.py refresh_subscription_due` so the treasurer dashboard starts
+    the day with a warm cache.
+    """
+    from .birthday_utils import _seconds_until_midnight
+    from .models import VeteranMember
+
+    today = today or date.today()
+    lists = {
+        status: list(filter_subscription_status(VeteranMember.objects.all(), status, today).order_by(
+            'subscription_due', 'pk'
+        ).values_list('pk', flat=True))
+        for status in (SUBSCRIPTION_DUE_SOON, SUBSCRIPTION_OVERDUE)
+    }
+    _due_lists_cache().set(_due_lists_cache_key(today), lists, _seconds_until_midnight())
+    return lists
+
+
+def get_subscription_due_lists(today=None):
+    """Return {'due_soon': [member ids], 'overdue': [member ids]} for today, cached until midnight"""
+    today = today or date.today()
+    lists = _due_lists_cache().get(_due_lists_cache_key(today))
+    if lists is None:
+        lists = compute_subscription_due_lists(today)
+    return lists
+
+
+def invalidate_subscription_due_lists(today=None):
+    """Drop today's cached due lists"""
+    _due_lists_cache().delete(_due_lists_cache_key(today or date.today()))
+
+
+def get_subscription_due_members(limit=10, today=None):
+    """First `limit` members of each cached due list (earliest due first), e.g. for reminders"""
+    from .models import VeteranMember
+
+    ids = {status: member_ids[:limit] for status, member_ids in get_subscription_due_lists(today).items()}
+    members = VeteranMember.objects.select_related('state').in_bulk(
+        [pk for member_ids in ids.values() for pk in member_ids]
+    )
+    # Members deleted since the lists were cached are skipped
+    return {status: [members[pk] for pk in member_ids if pk in members] for status, member_ids in ids.items()}
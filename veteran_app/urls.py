@@ -13,10 +13,16 @@ urlpatterns = [
     path('state/<int:state_id>/dashboard/', views.state_dashboard, name='state_dashboard'),
     path('state/<int:state_id>/members/', views.state_members, name='state_members'),
     path('state/<int:state_id>/add-member/', views.add_member, name='add_member'),
+    path('state/<int:state_id>/import-members/', views.import_members, name='import_members'),
+    path('state/<int:state_id>/import-members/template/', views.import_template, name='import_template'),
+    path('imports/<int:job_id>/', views.import_job_detail, name='import_job_detail'),
+    path('imports/<int:job_id>/status/', views.import_job_status, name='import_job_status'),
+    path('imports/<int:job_id>/errors/', views.import_job_errors, name='import_job_errors'),
     path('member/<int:member_id>/edit/', views.edit_member, name='edit_member'),
     path('member/<int:member_id>/delete/', views.delete_member, name='delete_member'),
     path('member/<int:member_id>/approve/', views.approve_member, name='approve_member'),
     path('member/<int:member_id>/disapprove/', views.disapprove_member, name='disapprove_member'),
+    path('state/<int:state_id>/members/moderate/', views.bulk_moderate_members, name='bulk_moderate_members'),
     path('member/<int:member_id>/download/', views.download_document, name='download_document'),
     path('state/<int:state_id>/download/', views.download_members, name='download_members'),
     
@@ -51,7 +57,7 @@ urlpatterns = [
     path('transaction-list/', views.transaction_list, name='transaction_list'),
     path('transaction-detail/<int:transaction_id>/', views.transaction_detail, name='transaction_detail'),
     path('delete-transaction/<int:transaction_id>/', views.delete_transaction, name='delete_transaction'),
-    path('generate-report/', views.generate_report, name='generate_report'),
+    path('generate-report/', views.generate_financial_report, name='generate_financial_report'),
     path('export-transactions/', views.export_transactions, name='export_transactions'),
     
     # User Profile and Settings
@@ -122,8 +128,12 @@ urlpatterns = [
     # Reporting System
     path('reports/', views.reports_builder, name='reports_builder'),
     path('reports/generate/', views.generate_report, name='generate_report'),
+    path('reports/exports/<int:job_id>/', views.export_job_detail, name='export_job_detail'),
+    path('reports/exports/<int:job_id>/status/', views.export_job_status, name='export_job_status'),
+    path('reports/exports/<int:job_id>/download/', views.download_export, name='download_export'),
     path('reports/save-config/', views.save_report_config, name='save_report_config'),
     path('reports/load-config/<int:config_id>/', views.load_report_config, name='load_report_config'),
+    path('reports/run-config/<int:config_id>/', views.run_report_config, name='run_report_config'),
     
     # Gallery
     path('gallery/', views.gallery, name='gallery'),
@@ -6,8 +6,10 @@ from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
 from .models import VeteranMember, AssociationVerification
+from .decorators import skip_global_announcements
 import json
 
+@skip_global_announcements
 def verify_association_number(request, association_number):
     """Public verification endpoint for association numbers"""
     try:
@@ -63,6 +65,7 @@ def verification_page(request, association_number=None):
     })
 
 @csrf_exempt
+@skip_global_announcements
 def bulk_verify_association(request):
     """Bulk verification endpoint for organizations"""
     if request.method != 'POST':
@@ -6,15 +6,26 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse, FileResponse, Http404
+from django.urls import reverse
 from django.core.exceptions import PermissionDenied
 from django.db import models as django_models
 from .models import Event
 from django.contrib.auth.hashers import make_password
-from .decorators import rate_limit, require_permissions, validate_state_access, require_state_access
+from django.conf import settings
+from .birthday_utils import get_upcoming_birthdays, instrument_birthdays, invalidate_birthday_cache
+from .stats_utils import get_membership_stats, invalidate_membership_stats, member_stats_by_state
+from .subscription_utils import get_subscription_due_members, subscription_status_counts
+from .schedule_utils import next_scheduled_run
+from .identity_utils import Identity, resolve_identity
+from .import_utils import IMPORT_MAX_UPLOAD_SIZE, IMPORT_REQUIRED_COLUMNS, IMPORT_TEMPLATE_COLUMNS, available_import_formats, enqueue_import
+from .export_utils import EXPORT_CHUNK_SIZE, available_export_formats, enqueue_export, fail_stale_jobs, ledger_totals, streaming_csv_response, streaming_ledger_response
+from .report_utils import (REPORT_FILTER_FIELDS, report_columns_from_post, report_config_form_data, report_filters_from_post,
+                           veteran_report_params)
+from .decorators import rate_limit, require_permissions, validate_state_access, require_state_access, skip_global_announcements
 from .models import (Rank, Branch, Message, VeteranMember, State, CarouselSlide, UserState, Document, Notification, VeteranUser,
                      Child, JobPortal, Matrimonial, ChatMessage, ChatRequest, BloodGroup, FinancialYear, Transaction, 
                      BankAccount, Expense, ExpenseCategory, FinancialReport, SubscriptionPlan, Event, EventCategory, 
-                     EventRegistration, PaymentGateway, PaymentOrder, PaymentWebhook, TwoFactorAuth, ReportConfiguration, GalleryImage, AccountsUser)
+                     EventRegistration, PaymentGateway, PaymentOrder, PaymentWebhook, TwoFactorAuth, ReportConfiguration, GalleryImage, AccountsUser, ExportJob, ImportJob)
 Group = Branch  # Backward compatibility
 from .forms import (RankForm, BranchForm, LoginForm, VeteranMemberForm, CarouselSlideForm, VeteranRegistrationForm, 
                     CreateVeteranUserForm, ChildForm, JobPortalForm, MatrimonialForm, AnnouncementForm)
@@ -31,65 +42,41 @@ def is_superuser(user):
 
 def index(request):
     # If user is authenticated, check their role and approval status
-    if request.user.is_authenticated and not request.user.is_superuser:
-        try:
-            # Check if user is a state admin
-            user_state = request.user.state_profile
-            if user_state.approved:
+    identity = request.identity
+    if identity.is_authenticated and not identity.is_superuser:
+        if identity.is_state_admin:
+            if identity.state_approved:
                 # Redirect approved state admin to their state dashboard
-                return redirect('state_dashboard', state_id=user_state.state.id)
-        except UserState.DoesNotExist:
-            # Check if user is a veteran
-            try:
-                veteran_user = request.user.veteran_profile
-                if not veteran_user.approved:
-                    # Redirect unapproved veteran to welcome page
-                    return redirect('veteran_welcome')
-                else:
-                    # Redirect approved veteran to dashboard
-                    return redirect('veteran_dashboard')
-            except VeteranUser.DoesNotExist:
-                pass
+                return redirect('state_dashboard', state_id=identity.state_id)
+        elif identity.is_veteran:
+            if not identity.veteran_approved:
+                # Redirect unapproved veteran to welcome page
+                return redirect('veteran_welcome')
+            else:
+                # Redirect approved veteran to dashboard
+                return redirect('veteran_dashboard')
     
-    # Get veteran birthdays (today and upcoming)
-    from datetime import datetime, timedelta
-    today = datetime.now().date()
-    upcoming_days = 7  # Show birthdays for next 7 days
-    
-    veteran_birthdays = []
-    for i in range(upcoming_days):
-        check_date = today + timedelta(days=i)
-        birthdays = VeteranMember.objects.filter(
-            date_of_birth__month=check_date.month,
-            date_of_birth__day=check_date.day,
-            approved=True
-        ).order_by('name')[:5]  # Limit to 5 per day
-        
-        for veteran in birthdays:
-            age = today.year - veteran.date_of_birth.year
-            if (today.month, today.day) < (veteran.date_of_birth.month, veteran.date_of_birth.day):
-                age -= 1
-            veteran_birthdays.append({
-                'veteran': veteran,
-                'date': check_date,
-                'age': age + 1,  # Age they will turn
-                'is_today': i == 0
-            })
+    # Get veteran birthdays (today and upcoming) in one indexed range query
+    with instrument_birthdays(request, 'index') as probe:
+        veteran_birthdays = get_upcoming_birthdays(
+            days=getattr(settings, 'UPCOMING_BIRTHDAYS_DAYS', 7),
+            per_day_limit=5  # Limit to 5 per day
+        )
+        probe['results'] = len(veteran_birthdays)
     
     # Get state admin notifications
     state_notifications = Notification.objects.filter(is_active=True).order_by('-created_at')[:5]
     
     carousel_slides = CarouselSlide.objects.filter(is_active=True).order_by('order')[:5]
-    total_members = VeteranMember.objects.count()
-    active_members = VeteranMember.objects.filter(membership=True).count()
+    membership_stats = get_membership_stats()
     states_covered = State.objects.count()
     
     return render(request, 'veteran_app/index.html', {
         'veteran_birthdays': veteran_birthdays,
         'state_notifications': state_notifications,
         'carousel_slides': carousel_slides,
-        'total_members': total_members,
-        'active_members': active_members,
+        'total_members': membership_stats['total_members'],
+        'active_members': membership_stats['active_members'],
         'states_covered': states_covered
     })
 
@@ -99,143 +86,54 @@ def about(request):
 def dashboard(request):
     """Dashboard view with metrics and quick access"""
     # Check if user is a veteran user - redirect them to appropriate dashboard
-    if request.user.is_authenticated and hasattr(request.user, 'veteran_profile'):
-        try:
-            veteran_user = request.user.veteran_profile
-            if not veteran_user.approved:
-                messages.info(request, 'Your account is pending approval. Please wait for administrator approval.')
-                return redirect('veteran_welcome')
-            else:
-                messages.info(request, 'Redirecting to your veteran dashboard.')
-                return redirect('veteran_dashboard')
-        except VeteranUser.DoesNotExist:
-            pass
+    if request.identity.is_veteran:
+        if not request.identity.veteran_approved:
+            messages.info(request, 'Your account is pending approval. Please wait for administrator approval.')
+            return redirect('veteran_welcome')
+        else:
+            messages.info(request, 'Redirecting to your veteran dashboard.')
+            return redirect('veteran_dashboard')
     
     # Get today's date
     from datetime import datetime, date
     today = date.today()
     
-    # Debug: Print today's date for verification
-    print(f"\n=== BIRTHDAY DEBUG ===")
-    print(f"Checking for birthdays on: {today} (Month: {today.month}, Day: {today.day})")
-    
-    # Debug: Get all veterans with today's birthday (regardless of approval)
-    all_today_birthdays = VeteranMember.objects.filter(
-        date_of_birth__month=today.month,
-        date_of_birth__day=today.day
-    )
-    print(f"\n=== VETERANS WITH TODAY'S BIRTHDAY ===")
-    print(f"Found {all_today_birthdays.count()} veterans with today's birthday:")
-    
-    for vet in all_today_birthdays:
-        print(f"\nVeteran Details:")
-        print(f"- ID: {vet.association_id}")
-        print(f"- Name: {vet.name}")
-        print(f"- DOB: {vet.date_of_birth}")
-        print(f"- Approved: {vet.approved}")
-        print(f"- Rank: {vet.rank.name if vet.rank else 'N/A'}")
-        print(f"- State: {vet.state.name if vet.state else 'N/A'}")
-    
-    # Debug: Search for veteran with name 'clakshmanan' (case-insensitive)
-    print("\n=== SEARCHING FOR VETERAN 'clakshmanan' ===")
-    try:
-        # First try exact match with correct case
-        clakshmanan = VeteranMember.objects.get(name='clakshmanan')
-        print(f"Found exact case-sensitive match for 'clakshmanan':")
-        print(f"- ID: {clakshmanan.id}")
-        print(f"- Name: {clakshmanan.name}")
-        print(f"- DOB: {clakshmanan.date_of_birth}")
-        print(f"- Approved: {clakshmanan.approved}")
-    except VeteranMember.DoesNotExist:
-        print("No exact case-sensitive match for 'clakshmanan' found. Trying case-insensitive search...")
-        try:
-            # Try case-insensitive exact match
-            clakshmanan = VeteranMember.objects.get(name__iexact='clakshmanan')
-            print(f"Found case-insensitive match for 'clakshmanan':")
-            print(f"- ID: {clakshmanan.association_id}")
-            print(f"- Name in DB: {clakshmanan.name} (note: different case)")
-            print(f"- DOB: {clakshmanan.date_of_birth}")
-            print(f"- Approved: {clakshmanan.approved}")
-        except VeteranMember.DoesNotExist:
-            print("No exact match found. Trying partial match...")
-            try:
-                # Try partial match
-                matches = VeteranMember.objects.filter(name__icontains='clakshmanan')
-                if matches.exists():
-                    print(f"Found {matches.count()} partial matches for 'clakshmanan':")
-                    for i, vet in enumerate(matches, 1):
-                        print(f"\nMatch {i}:")
-                        print(f"- ID: {vet.association_id}")
-                        print(f"- Name: {vet.name}")
-                        print(f"- DOB: {vet.date_of_birth}")
-                        print(f"- Approved: {vet.approved}")
-                else:
-                    print("No veteran with 'clakshmanan' in name found in database")
-            except Exception as e:
-                print(f"Error during partial name search: {str(e)}")
-        except VeteranMember.MultipleObjectsReturned:
-            print("Multiple exact matches for 'clakshmanan' found (case-insensitive)")
-    except VeteranMember.MultipleObjectsReturned:
-        print("Multiple exact case-sensitive matches for 'clakshmanan' found")
-    
-    # Filter veterans whose birthday is today and are approved
-    todays_birthdays = VeteranMember.objects.filter(
-        date_of_birth__month=today.month,
-        date_of_birth__day=today.day,
-        approved=True
-    ).select_related('rank', 'state', 'blood_group').order_by('name')
-    
-    # Debug: Print query results
-    print(f"\nFound {len(todays_birthdays)} approved birthdays today")
-    
-    veteran_birthdays = []
-    for veteran in todays_birthdays:
-        # Calculate current age (age they are today)
-        age = today.year - veteran.date_of_birth.year
-        # Adjust if birthday hasn't occurred this year yet
-        if (today.month, today.day) < (veteran.date_of_birth.month, veteran.date_of_birth.day):
-            age -= 1
-        
-        # Debug: Print veteran info
-        print(f"- {veteran.name}: DOB {veteran.date_of_birth}, Current age: {age}")
-        
-        veteran_birthdays.append({
-            'veteran': veteran,
-            'age': age,  # Current age
-            'is_today': True
-        })
+    # Approved veterans whose birthday is today (single indexed query)
+    with instrument_birthdays(request, 'dashboard') as probe:
+        veteran_birthdays = get_upcoming_birthdays(days=1, today=today)
+        probe['results'] = len(veteran_birthdays)
     
     # Get state admin notifications
     state_notifications = Notification.objects.filter(is_active=True).order_by('-created_at')[:10]
     
-    # Calculate statistics
-    total_members = VeteranMember.objects.count()
-    active_members = VeteranMember.objects.filter(membership=True).count()
+    # Statistics from the membership rollup (one row)
+    membership_stats = get_membership_stats()
     states_covered = State.objects.count()
     current_month_year = today.strftime("%b %Y")
     
     return render(request, 'veteran_app/dashboard.html', {
         'veteran_birthdays': veteran_birthdays,
         'state_notifications': state_notifications,
-        'total_members': total_members,
-        'active_members': active_members,
+        'total_members': membership_stats['total_members'],
+        'active_members': membership_stats['active_members'],
         'states_covered': states_covered,
         'current_month_year': current_month_year
     })
 
 def services(request):
     # If user is authenticated and is a state admin, redirect to their state dashboard
-    if request.user.is_authenticated and not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if user_state.approved:
-                # Redirect state admin directly to their state dashboard
-                return redirect('state_dashboard', state_id=user_state.state.id)
-        except UserState.DoesNotExist:
-            pass
+    identity = request.identity
+    if identity.is_authenticated and not identity.is_superuser and identity.is_approved_state_admin:
+        # Redirect state admin directly to their state dashboard
+        return redirect('state_dashboard', state_id=identity.state_id)
     
     # For superusers and public users, show all states
     states = State.objects.all().order_by('name')
+    if request.user.is_superuser:
+        # Overview counters for every state in one grouped query
+        stats_by_state = member_stats_by_state()
+        for state in states:
+            state.stats = stats_by_state.get(state.id)
     return render(request, 'veteran_app/services.html', {'states': states})
 
 def login_view(request):
@@ -245,27 +143,24 @@ def login_view(request):
     
     if request.user.is_authenticated:
         # Redirect based on user role
-        if request.user.is_superuser:
+        identity = request.identity
+        if identity.is_superuser:
             return redirect('index')
         # Check if user has state profile and is approved
-        try:
-            user_state = request.user.state_profile
-            if user_state.approved:
+        if identity.is_state_admin:
+            if identity.state_approved:
                 # Redirect state admin directly to their state dashboard
-                return redirect('state_dashboard', state_id=user_state.state.id)
+                return redirect('state_dashboard', state_id=identity.state_id)
             else:
                 # User not approved, logout and show message
                 logout(request)
                 messages.warning(request, 'Your account is pending approval by the superadmin. Please contact the administrator.')
                 return redirect('login')
-        except UserState.DoesNotExist:
-            # Check if user is a veteran
-            try:
-                veteran_user = request.user.veteran_profile
-                return redirect('veteran_dashboard')
-            except VeteranUser.DoesNotExist:
-                # Regular user without state assignment
-                return redirect('index')
+        # Check if user is a veteran
+        if identity.is_veteran:
+            return redirect('veteran_dashboard')
+        # Regular user without state assignment
+        return redirect('index')
     
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST)
@@ -291,44 +186,41 @@ def login_view(request):
                     messages.success(request, f'Hi, Superadmin {username}!')
                     return redirect('index')
                 
+                # Role and approval of every profile in one query
+                identity = Identity(user, resolve_identity(user.pk))
+                
                 # Check if user has state profile
-                try:
-                    user_state = user.state_profile
-                    if not user_state.approved:
+                if identity.is_state_admin:
+                    if not identity.state_approved:
                         messages.warning(request, 'Your account is pending approval by the superadmin. Please contact the administrator.')
                         return redirect('login')
                     
                     # User is approved, login and redirect to their state dashboard
                     login(request, user)
                     messages.success(request, f'Welcome back, {username}!')
-                    return redirect('state_dashboard', state_id=user_state.state.id)
-                except UserState.DoesNotExist:
-                    # Check if user is accounts user
-                    try:
-                        accounts_user = user.accounts_profile
-                        if not accounts_user.approved:
-                            messages.warning(request, 'Your account is pending approval by the superadmin. Please contact the administrator.')
-                            return redirect('login')
-                        
-                        # Accounts user is approved, login and redirect to treasurer dashboard
-                        login(request, user)
-                        messages.success(request, f'Welcome back, {username}!')
-                        return redirect('treasurer_dashboard')
-                    except:
-                        # Check if user is a veteran
-                        try:
-                            veteran_user = user.veteran_profile
-                            login(request, user)
-                            messages.success(request, f'Welcome back, {username}!')
-                            if veteran_user.approved:
-                                return redirect('veteran_dashboard')
-                            else:
-                                return redirect('veteran_welcome')
-                        except VeteranUser.DoesNotExist:
-                            # Regular user without state assignment
-                            login(request, user)
-                            messages.success(request, f'Welcome back, {username}!')
-                            return redirect('index')
+                    return redirect('state_dashboard', state_id=identity.state_id)
+                
+                # Check if user is accounts user
+                if identity.is_accounts:
+                    if not identity.accounts_approved:
+                        messages.warning(request, 'Your account is pending approval by the superadmin. Please contact the administrator.')
+                        return redirect('login')
+                    
+                    # Accounts user is approved, login and redirect to treasurer dashboard
+                    login(request, user)
+                    messages.success(request, f'Welcome back, {username}!')
+                    return redirect('treasurer_dashboard')
+                
+                # Check if user is a veteran
+                login(request, user)
+                messages.success(request, f'Welcome back, {username}!')
+                if identity.is_veteran:
+                    if identity.veteran_approved:
+                        return redirect('veteran_dashboard')
+                    else:
+                        return redirect('veteran_welcome')
+                # Regular user without state assignment
+                return redirect('index')
             else:
                 messages.error(request, 'Invalid username or password.')
         else:
@@ -349,17 +241,13 @@ def state_members(request, state_id):
         raise Http404("Invalid state ID")
     
     # Check if user is a veteran user - redirect them to appropriate dashboard
-    if hasattr(request.user, 'veteran_profile'):
-        try:
-            veteran_user = request.user.veteran_profile
-            if not veteran_user.approved:
-                messages.info(request, 'Your account is pending approval. Please wait for administrator approval.')
-                return redirect('veteran_welcome')
-            else:
-                messages.info(request, 'Redirecting to your veteran dashboard.')
-                return redirect('veteran_dashboard')
-        except VeteranUser.DoesNotExist:
-            pass
+    if request.identity.is_veteran:
+        if not request.identity.veteran_approved:
+            messages.info(request, 'Your account is pending approval. Please wait for administrator approval.')
+            return redirect('veteran_welcome')
+        else:
+            messages.info(request, 'Redirecting to your veteran dashboard.')
+            return redirect('veteran_dashboard')
     
     # Permission checking is now handled by the @require_state_access decorator
     # This ensures:
@@ -388,15 +276,14 @@ def add_member(request, state_id):
         raise Http404("Invalid state ID")
     
     # Check permissions - Proper authorization check
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved:
-                raise PermissionDenied('Your account is not approved.')
-            if user_state.state != state:
-                raise PermissionDenied('You do not have permission to add veterans to this state.')
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not identity.is_superuser:
+        if not identity.is_state_admin:
             raise PermissionDenied('You do not have permission to add veterans.')
+        if not identity.state_approved:
+            raise PermissionDenied('Your account is not approved.')
+        if identity.state_id != state.id:
+            raise PermissionDenied('You do not have permission to add veterans to this state.')
     
     # State-based access control is sufficient - no need for Django model permissions
     
@@ -467,7 +354,7 @@ def add_member(request, state_id):
                             
                             # Update membership status
                             member.membership = True
-                            member.save()
+                            member.save(update_fields=['membership', 'updated_at'])
                     except (ValueError, Exception):
                         pass  # Silently ignore transaction errors
                 
@@ -503,18 +390,17 @@ def edit_member(request, member_id):
     # Generate association number if not exists
     if not member.association_number:
         member.generate_association_number()
-        member.save(update_fields=['association_number'])
+        member.save(update_fields=['association_number', 'updated_at'])
     
     # Check permissions
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved:
-                raise PermissionDenied('Your account is not approved.')
-            if user_state.state != state:
-                raise PermissionDenied('You do not have permission to edit this veteran.')
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not identity.is_superuser:
+        if not identity.is_state_admin:
             raise PermissionDenied('You do not have permission to edit veterans.')
+        if not identity.state_approved:
+            raise PermissionDenied('Your account is not approved.')
+        if identity.state_id != state.id:
+            raise PermissionDenied('You do not have permission to edit this veteran.')
     
     if request.method == 'POST':
         form = VeteranMemberForm(request.POST, request.FILES, instance=member)
@@ -574,7 +460,7 @@ def edit_member(request, member_id):
                                 
                                 # Update membership status
                                 updated_member.membership = True
-                                updated_member.save()
+                                updated_member.save(update_fields=['membership', 'updated_at'])
                         except (ValueError, Exception):
                             pass  # Silently ignore transaction errors
                 
@@ -620,16 +506,15 @@ def approve_member(request, member_id):
     member = get_object_or_404(VeteranMember, association_id=member_id)
     
     # Check permissions - both superuser and state admin can approve
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved or user_state.state != member.state:
-                raise PermissionDenied('You do not have permission to approve this member.')
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not identity.is_superuser:
+        if not identity.is_state_admin:
             raise PermissionDenied('You do not have permission to approve members.')
+        if not identity.can_access_state(member.state_id):
+            raise PermissionDenied('You do not have permission to approve this member.')
     
     member.approved = True
-    member.save()
+    member.save(update_fields=['approved', 'updated_at'])
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
@@ -646,16 +531,15 @@ def disapprove_member(request, member_id):
     member = get_object_or_404(VeteranMember, association_id=member_id)
     
     # Check permissions - both superuser and state admin can disapprove
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved or user_state.state != member.state:
-                raise PermissionDenied('You do not have permission to disapprove this member.')
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not identity.is_superuser:
+        if not identity.is_state_admin:
             raise PermissionDenied('You do not have permission to disapprove members.')
+        if not identity.can_access_state(member.state_id):
+            raise PermissionDenied('You do not have permission to disapprove this member.')
     
     member.approved = False
-    member.save()
+    member.save(update_fields=['approved', 'updated_at'])
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return JsonResponse({
@@ -667,7 +551,59 @@ def disapprove_member(request, member_id):
     messages.warning(request, f'Veteran "{member.name}" disapproved successfully!')
     return redirect('state_members', state_id=member.state.id)
 
+@require_state_access()
+def bulk_moderate_members(request, state_id):
+    """Approve or disapprove many members of a state with one UPDATE.
+
+    Accepts POSTed member_ids (repeated, or comma-separated) and
+    action=approve|disapprove. State access is checked once by the decorator;
+    ids outside the state are ignored by the state_id filter.
+    """
+    if request.method != 'POST':
+        return redirect('state_members', state_id=state_id)
+    
+    action = request.POST.get('action')
+    member_ids = set()
+    for value in request.POST.getlist('member_ids'):
+        member_ids.update(int(part) for part in value.split(',') if part.strip().isdigit())
+    
+    if action not in ('approve', 'disapprove') or not member_ids:
+        message = 'Select at least one veteran and an action.'
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({'success': False, 'message': message}, status=400)
+        messages.error(request, message)
+        return redirect('state_members', state_id=state_id)
+    
+    approved = action == 'approve'
+    # Bypasses save() and its signals: bump updated_at (report data version)
+    # and drop the caches the per-member signals would have refreshed
+    updated = VeteranMember.objects.filter(
+        state_id=state_id,
+        association_id__in=member_ids
+    ).exclude(approved=approved).update(approved=approved, updated_at=timezone.now())
+    if updated:
+        invalidate_membership_stats(state_id)
+        invalidate_birthday_cache()
+    
+    status = 'approved' if approved else 'pending'
+    message = f'{updated} veteran(s) {"approved" if approved else "disapproved"} successfully!'
+    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return JsonResponse({
+            'success': True,
+            'status': status,
+            'updated': updated,
+            'member_ids': sorted(member_ids),
+            'message': message
+        })
+    
+    if approved:
+        messages.success(request, message)
+    else:
+        messages.warning(request, message)
+    return redirect('state_members', state_id=state_id)
+
 @login_required
+@skip_global_announcements
 def download_members(request, state_id):
     state = get_object_or_404(State, id=state_id)
     
@@ -683,44 +619,124 @@ def download_members(request, state_id):
             messages.error(request, 'You do not have permission to download data.')
             return redirect('index')
     
-    members = VeteranMember.objects.filter(state=state).order_by('name')
+    members = VeteranMember.objects.filter(state=state).select_related(
+        'rank', 'branch', 'blood_group'
+    ).order_by('name')
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="{state.code}_veterans.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow([
+    header = [
         'Association ID', 'Association Number', 'Name', 'Rank', 'Branch', 'Service Number', 'Date of Birth',
         'Blood Group', 'Contact', 'Address', 'Living City', 'ZIP Code', 'Date of Joining', 'Retired On',
         'Enrolled Date', 'Association Date', 'Membership', 'Subscription Paid On',
         'Approved', 'Created At'
-    ])
-    
-    for member in members:
-        writer.writerow([
-            member.association_id,
-            member.association_number or 'Not Assigned',
-            member.name,
-            member.rank.name,
-            member.branch.name,
-            member.service_number,
-            member.date_of_birth,
-            member.blood_group.name,
-            member.contact,
-            member.address,
-            member.living_city or '',
-            member.zip_code or '',
-            member.date_of_joining,
-            member.retired_on,
-            member.enrolled_date,
-            member.association_date,
-            'Yes' if member.membership else 'No',
-            member.subscription_paid_on,
-            'Yes' if member.approved else 'No',
-            member.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
+    ]
     
-    return response
+    def rows():
+        for member in members.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [
+                member.association_id,
+                member.association_number or 'Not Assigned',
+                member.name,
+                member.rank.name,
+                member.branch.name,
+                member.service_number,
+                member.date_of_birth,
+                member.blood_group.name,
+                member.contact,
+                member.address,
+                member.living_city or '',
+                member.zip_code or '',
+                member.date_of_joining,
+                member.retired_on,
+                member.enrolled_date,
+                member.association_date,
+                'Yes' if member.membership else 'No',
+                member.subscription_paid_on,
+                'Yes' if member.approved else 'No',
+                member.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            ]
+    
+    # Streamed: first bytes go out immediately and memory stays flat
+    return streaming_csv_response(f"{state.code}_veterans.csv", header, rows())
+
+@require_state_access()
+def import_members(request, state_id):
+    """Upload a CSV/XLSX of members; the import runs as a background ImportJob"""
+    state = get_object_or_404(State, id=state_id)
+    import_formats = available_import_formats()
+    
+    if request.method == 'POST':
+        uploaded = request.FILES.get('import_file')
+        extension = os.path.splitext(uploaded.name)[1].lower().lstrip('.') if uploaded else ''
+        if not uploaded:
+            messages.error(request, 'Please choose a file to import.')
+        elif extension not in import_formats:
+            messages.error(request, f'Unsupported file type. Allowed: {", ".join(import_formats).upper()}.')
+        elif uploaded.size > IMPORT_MAX_UPLOAD_SIZE:
+            messages.error(request, f'File is too large (max {IMPORT_MAX_UPLOAD_SIZE // (1024 * 1024)} MB).')
+        else:
+            job = enqueue_import(request.user, state, uploaded)
+            messages.success(request, 'Import queued. Rows are validated and imported in the background.')
+            return redirect('import_job_detail', job_id=job.id)
+    
+    return render(request, 'veteran_app/import_members.html', {
+        'state': state,
+        'import_formats': import_formats,
+        'required_columns': IMPORT_REQUIRED_COLUMNS,
+        'recent_jobs': ImportJob.objects.filter(state=state).select_related('created_by')[:10]
+    })
+
+@require_state_access()
+@skip_global_announcements
+def import_template(request, state_id):
+    """Empty CSV with the import columns, as a starting point for state admins"""
+    state = get_object_or_404(State, id=state_id)
+    return streaming_csv_response(f"{state.code}_import_template.csv", IMPORT_TEMPLATE_COLUMNS, [])
+
+def _get_import_job(request, job_id):
+    """Import job visible to the current user (owner or superuser)"""
+    job = get_object_or_404(ImportJob.objects.select_related('state'), id=job_id)
+    if job.created_by_id != request.user.id and not request.user.is_superuser:
+        raise PermissionDenied
+    if job.status == ImportJob.STATUS_RUNNING and fail_stale_jobs(ImportJob):
+        # Its worker died; show the failure instead of polling forever
+        job.refresh_from_db()
+    return job
+
+@login_required
+def import_job_detail(request, job_id):
+    """Progress and per-row error report of a member import"""
+    job = _get_import_job(request, job_id)
+    
+    return render(request, 'veteran_app/import_job_detail.html', {
+        'job': job,
+        'errors': job.errors[:100],
+        'more_errors': len(job.errors) > 100
+    })
+
+@login_required
+@skip_global_announcements
+def import_job_status(request, job_id):
+    """JSON progress of a member import, polled by the progress page"""
+    job = _get_import_job(request, job_id)
+    
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'processed_rows': job.processed_rows,
+        'total_rows': job.total_rows,
+        'created_count': job.created_count,
+        'error_count': job.error_count,
+        'error': job.error
+    })
+
+@login_required
+@skip_global_announcements
+def import_job_errors(request, job_id):
+    """Download the per-row validation errors of an import as CSV"""
+    job = _get_import_job(request, job_id)
+    rows = ([error['row'], error['field'], error['message']] for error in job.errors)
+    return streaming_csv_response(f"import_{job.id}_errors.csv", ['Row', 'Column', 'Error'], rows)
 
 @login_required
 @user_passes_test(is_superuser)
@@ -799,13 +815,12 @@ def download_document(request, member_id):
         raise Http404("Invalid member ID")
     
     # Check permissions
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved or user_state.state != member.state:
-                raise PermissionDenied('You do not have permission to download this attachment.')
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not identity.is_superuser:
+        if not identity.is_state_admin:
             raise PermissionDenied('You do not have permission to download attachments.')
+        if not identity.can_access_state(member.state_id):
+            raise PermissionDenied('You do not have permission to download this attachment.')
     
     # State-based access control is sufficient - no need for Django model permissions
     
@@ -1005,21 +1020,9 @@ def state_dashboard(request, state_id):
     # Get current date
     current_date = datetime.now()
     
-    # Calculate statistics
+    # Statistics from the membership rollup (one row)
     all_members = VeteranMember.objects.filter(state=state)
-    
-    # This month's members
-    first_day_of_month = current_date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    this_month_members = all_members.filter(created_at__gte=first_day_of_month).count()
-    
-    stats = {
-        'total_members': all_members.count(),
-        'active_members': all_members.filter(membership=True).count(),
-        'inactive_members': all_members.filter(membership=False).count(),
-        'approved_members': all_members.filter(approved=True).count(),
-        'pending_members': all_members.filter(approved=False).count(),
-        'this_month_members': this_month_members,
-    }
+    stats = get_membership_stats(state)
     
     # Get recent members (last 10) - force fresh query
     recent_members = all_members.select_related('rank', 'state').order_by('-created_at')[:10]
@@ -1042,50 +1045,39 @@ def media_documents(request):
     from django.utils import timezone
     
     # Check if user is approved to access media
-    if not request.user.is_superuser:
-        try:
-            # Check if state admin is approved
-            if hasattr(request.user, 'state_profile') and not request.user.state_profile.approved:
-                messages.error(request, 'Your account is pending approval. You cannot access media documents.')
-                return redirect('index')
-            # Check if veteran is approved
-            elif hasattr(request.user, 'veteran_profile') and not request.user.veteran_profile.approved:
-                messages.error(request, 'Your account is pending approval. You cannot access media documents.')
-                return redirect('index')
-        except:
-            messages.error(request, 'Access denied. Please contact administrator.')
+    identity = request.identity
+    if not identity.is_superuser:
+        # Check if state admin is approved
+        if identity.is_state_admin and not identity.state_approved:
+            messages.error(request, 'Your account is pending approval. You cannot access media documents.')
+            return redirect('index')
+        # Check if veteran is approved
+        elif identity.is_veteran and not identity.veteran_approved:
+            messages.error(request, 'Your account is pending approval. You cannot access media documents.')
             return redirect('index')
-    
-    # Get user's state if applicable
-    user_state = None
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile.state
-        except:
-            pass
     
     # Filter documents based on user permissions
-    if request.user.is_superuser:
+    if identity.is_superuser:
         documents = Document.objects.filter(is_public=True)
-    elif user_state:
+    elif identity.state_id:
         # State users see their state docs and all-state docs
         documents = Document.objects.filter(
             is_public=True
         ).filter(
-            django_models.Q(state=user_state) | django_models.Q(state__isnull=True)
+            django_models.Q(state_id=identity.state_id) | django_models.Q(state__isnull=True)
         )
     else:
         # Regular users see only all-state docs
         documents = Document.objects.filter(is_public=True, state__isnull=True)
     
     # Get active notifications
-    if request.user.is_superuser:
+    if identity.is_superuser:
         notifications = Notification.objects.filter(is_active=True)
-    elif user_state:
+    elif identity.state_id:
         notifications = Notification.objects.filter(
             is_active=True
         ).filter(
-            django_models.Q(state=user_state) | django_models.Q(state__isnull=True)
+            django_models.Q(state_id=identity.state_id) | django_models.Q(state__isnull=True)
         )
     else:
         notifications = Notification.objects.filter(is_active=True, state__isnull=True)
@@ -1156,13 +1148,8 @@ def view_document(request, doc_id):
         return redirect('media_documents')
     
     # Check state access
-    if doc.state and not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile.state
-            if doc.state != user_state:
-                messages.error(request, 'You do not have permission to view this document.')
-                return redirect('media_documents')
-        except:
+    if doc.state_id and not request.identity.is_superuser:
+        if doc.state_id != request.identity.state_id:
             messages.error(request, 'You do not have permission to view this document.')
             return redirect('media_documents')
     
@@ -1184,13 +1171,8 @@ def download_document_file(request, doc_id):
         return redirect('media_documents')
     
     # Check state access
-    if doc.state and not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile.state
-            if doc.state != user_state:
-                messages.error(request, 'You do not have permission to download this document.')
-                return redirect('media_documents')
-        except:
+    if doc.state_id and not request.identity.is_superuser:
+        if doc.state_id != request.identity.state_id:
             messages.error(request, 'You do not have permission to download this document.')
             return redirect('media_documents')
     
@@ -1332,7 +1314,7 @@ def veteran_dashboard(request):
         # Generate association number if not exists
         if not veteran.association_number:
             veteran.generate_association_number()
-            veteran.save(update_fields=['association_number'])
+            veteran.save(update_fields=['association_number', 'updated_at'])
             
     except VeteranUser.DoesNotExist:
         messages.error(request, 'Veteran profile not found.')
@@ -1370,7 +1352,7 @@ def veteran_profile_edit(request):
         # Generate association number if not exists
         if not veteran.association_number:
             veteran.generate_association_number()
-            veteran.save(update_fields=['association_number'])
+            veteran.save(update_fields=['association_number', 'updated_at'])
             
     except VeteranUser.DoesNotExist:
         messages.error(request, 'Veteran profile not found.')
@@ -1425,7 +1407,7 @@ def veteran_profile_edit(request):
                                 
                                 # Update membership status
                                 updated_veteran.membership = True
-                                updated_veteran.save()
+                                updated_veteran.save(update_fields=['membership', 'updated_at'])
                                 
                                 messages.success(request, f'Profile updated and subscription payment of ₹{amount} recorded successfully!')
                             else:
@@ -1548,14 +1530,12 @@ def approve_veteran_user(request, veteran_user_id):
         # Superadmin can approve any veteran
         pass
     else:
-        try:
-            user_state = request.user.state_profile
-            if user_state.state != state:
-                messages.error(request, 'You do not have permission to approve this account.')
-                return redirect('services')
-        except UserState.DoesNotExist:
+        if not request.identity.is_state_admin:
             messages.error(request, 'You do not have permission to approve veteran accounts.')
             return redirect('index')
+        if request.identity.state_id != state.id:
+            messages.error(request, 'You do not have permission to approve this account.')
+            return redirect('services')
     
     veteran_user.approved = True
     veteran_user.approved_by = request.user
@@ -1580,14 +1560,12 @@ def disapprove_veteran_user(request, veteran_user_id):
         # Superadmin can disapprove any veteran
         pass
     else:
-        try:
-            user_state = request.user.state_profile
-            if user_state.state != state:
-                messages.error(request, 'You do not have permission to disapprove this account.')
-                return redirect('services')
-        except UserState.DoesNotExist:
+        if not request.identity.is_state_admin:
             messages.error(request, 'You do not have permission to disapprove veteran accounts.')
             return redirect('index')
+        if request.identity.state_id != state.id:
+            messages.error(request, 'You do not have permission to disapprove this account.')
+            return redirect('services')
     
     veteran_user.approved = False
     veteran_user.save()
@@ -2094,13 +2072,11 @@ def post_announcement(request):
                 )
                 
                 # Set state for state admins
-                if not request.user.is_superuser:
-                    try:
-                        user_state = request.user.state_profile
-                        notification.state = user_state.state
-                    except UserState.DoesNotExist:
+                if not request.identity.is_superuser:
+                    if not request.identity.is_state_admin:
                         messages.error(request, 'Only state admins and superadmin can post announcements.')
                         return redirect('index')
+                    notification.state_id = request.identity.state_id
                 
                 notification.save()
                 messages.success(request, 'Announcement posted successfully!')
@@ -2110,14 +2086,9 @@ def post_announcement(request):
             messages.error(request, 'Please provide title, message, and expiry date.')
     
     # Redirect based on user type
-    if request.user.is_superuser:
-        return redirect('index')
-    else:
-        try:
-            user_state = request.user.state_profile
-            return redirect('state_dashboard', state_id=user_state.state.id)
-        except UserState.DoesNotExist:
-            return redirect('index')
+    if request.identity.is_state_admin and not request.identity.is_superuser:
+        return redirect('state_dashboard', state_id=request.identity.state_id)
+    return redirect('index')
 
 @login_required
 @user_passes_test(is_superuser)
@@ -2244,28 +2215,15 @@ def treasurer_dashboard(request):
         'other_income': other_income,
         'total_expenses': total_expenses,
         'net_balance': total_income - total_expenses,
-        'active_members': VeteranMember.objects.filter(membership=True).count(),
+        'active_members': get_membership_stats()['active_members'],
         'paid_subscriptions': paid_subscriptions
     }
     
-    # Subscription statistics
-    from datetime import date
-    today = date.today()
-    all_members = VeteranMember.objects.all()
-    subscription_stats = {
-        'active': 0, 'due_soon': 0, 'overdue': 0, 'no_payment': 0
-    }
+    # Subscription statistics (one GROUP BY over the classified members)
+    subscription_stats = subscription_status_counts()
     
-    for member in all_members:
-        status = member.get_subscription_status()
-        if status['status'] == 'Active':
-            subscription_stats['active'] += 1
-        elif status['status'] == 'Due Soon':
-            subscription_stats['due_soon'] += 1
-        elif status['status'] == 'Overdue':
-            subscription_stats['overdue'] += 1
-        else:
-            subscription_stats['no_payment'] += 1
+    # Members to remind, from the due lists precomputed nightly in the shared cache
+    subscription_due_members = get_subscription_due_members()
     
     # Recent transactions (expenses and other income only)
     recent_transactions = transactions.order_by('-created_at')[:10]
@@ -2284,6 +2242,7 @@ def treasurer_dashboard(request):
     return render(request, 'veteran_app/treasurer_dashboard.html', {
         'financial_summary': financial_summary,
         'subscription_stats': subscription_stats,
+        'subscription_due_members': subscription_due_members,
         'recent_transactions': recent_transactions,
         'recent_subscriptions': recent_subscriptions,
         'bank_accounts': bank_accounts,
@@ -2372,7 +2331,7 @@ def add_transaction(request):
             veteran = transaction.veteran
             veteran.subscription_paid_on = date.today()
             veteran.membership = True
-            veteran.save()
+            veteran.save(update_fields=['subscription_paid_on', 'membership', 'updated_at'])
         
         messages.success(request, f'Transaction {transaction_id} added successfully!')
     
@@ -2425,6 +2384,7 @@ def transaction_list(request):
     })
 
 @login_required
+@skip_global_announcements
 def transaction_detail(request, transaction_id):
     """Get transaction details for modal view"""
     # Allow superuser and accounts user
@@ -2468,7 +2428,7 @@ def delete_transaction(request, transaction_id):
     return JsonResponse({'success': True})
 
 @login_required
-def generate_report(request):
+def generate_financial_report(request):
     """Generate financial reports"""
     # Allow superuser and accounts user
     if not (request.user.is_superuser or request.user.username == 'accounts'):
@@ -2476,11 +2436,6 @@ def generate_report(request):
         return redirect('index')
     
     if request.method == 'POST':
-        from django.http import HttpResponse
-        from django.db.models import Sum
-        import csv
-        from datetime import datetime
-        
         start_date = request.POST.get('start_date')
         end_date = request.POST.get('end_date')
         report_type = request.POST.get('report_type')
@@ -2490,42 +2445,27 @@ def generate_report(request):
             created_at__date__range=[start_date, end_date]
         ).order_by('-created_at')
         
-        # Calculate totals
-        income = transactions.exclude(transaction_type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-        expenses = transactions.filter(transaction_type='expense').aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        # Create CSV response
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="financial_report_{start_date}_to_{end_date}.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Financial Report', f'{start_date} to {end_date}'])
-        writer.writerow([])
-        writer.writerow(['Summary'])
-        writer.writerow(['Total Income', f'₹{income}'])
-        writer.writerow(['Total Expenses', f'₹{expenses}'])
-        writer.writerow(['Net Balance', f'₹{income - expenses}'])
-        writer.writerow([])
-        writer.writerow(['Transaction Details'])
-        writer.writerow(['Date', 'Transaction ID', 'Type', 'Member', 'Amount', 'Method', 'Reference', 'Description'])
-        
-        for transaction in transactions:
-            writer.writerow([
-                transaction.created_at.strftime('%Y-%m-%d %H:%M'),
-                transaction.transaction_id,
-                transaction.get_transaction_type_display(),
-                transaction.veteran.name if transaction.veteran else 'N/A',
-                transaction.amount,
-                transaction.get_payment_method_display(),
-                transaction.reference_number,
-                transaction.description
-            ])
-        
-        return response
+        # Calculate totals (one aggregate query)
+        totals = ledger_totals(transactions)
+        
+        preamble = [
+            ['Financial Report', f'{start_date} to {end_date}'],
+            [],
+            ['Summary'],
+            ['Total Income', f'₹{totals["income"]}'],
+            ['Total Expenses', f'₹{totals["expenses"]}'],
+            ['Net Balance', f'₹{totals["net"]}'],
+            [],
+            ['Transaction Details'],
+        ]
+        return streaming_ledger_response(
+            f"financial_report_{start_date}_to_{end_date}.csv", transactions, preamble
+        )
     
     return redirect('treasurer_dashboard')
 
 @login_required
+@skip_global_announcements
 def export_transactions(request):
     """Export transactions to CSV"""
     # Allow superuser and accounts user
@@ -2533,9 +2473,6 @@ def export_transactions(request):
         messages.error(request, 'Access denied.')
         return redirect('index')
     
-    from django.http import HttpResponse
-    import csv
-    
     transactions = Transaction.objects.all().order_by('-created_at')
     
     # Apply same filters as transaction_list
@@ -2548,25 +2485,7 @@ def export_transactions(request):
     if request.GET.get('to_date'):
         transactions = transactions.filter(created_at__date__lte=request.GET.get('to_date'))
     
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Date', 'Transaction ID', 'Type', 'Member', 'Amount', 'Method', 'Reference', 'Description'])
-    
-    for transaction in transactions:
-        writer.writerow([
-            transaction.created_at.strftime('%Y-%m-%d %H:%M'),
-            transaction.transaction_id,
-            transaction.get_transaction_type_display(),
-            transaction.veteran.name if transaction.veteran else 'N/A',
-            transaction.amount,
-            transaction.get_payment_method_display(),
-            transaction.reference_number,
-            transaction.description
-        ])
-    
-    return response
+    return streaming_ledger_response('transactions.csv', transactions)
 
 # User Profile and Settings Views
 @login_required
@@ -2658,26 +2577,18 @@ def events_list(request):
     from django.core.paginator import Paginator
     
     # Get user's state if applicable
-    user_state = None
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile.state
-        except:
-            try:
-                veteran_user = request.user.veteran_profile
-                user_state = veteran_user.veteran_member.state
-            except:
-                pass
+    identity = request.identity
+    user_state_id = None if identity.is_superuser else identity.home_state_id
     
     # Filter events based on user permissions
-    if request.user.is_superuser:
+    if identity.is_superuser:
         events_list = Event.objects.filter(status='published')
-    elif user_state:
+    elif user_state_id:
         # Show events created by admin (created_by is superuser) OR events for user's state
         events_list = Event.objects.filter(
             status='published'
         ).filter(
-            django_models.Q(state=user_state) | 
+            django_models.Q(state_id=user_state_id) | 
             django_models.Q(state__isnull=True) |
             django_models.Q(created_by__is_superuser=True)
         )
@@ -2711,17 +2622,11 @@ def event_detail(request, event_id):
     can_register = False
     existing_registration = None
     
-    if hasattr(request.user, 'veteran_profile'):
-        try:
-            veteran_user = request.user.veteran_profile
-            if veteran_user.approved:
-                veteran = veteran_user.veteran_member
-                existing_registration = EventRegistration.objects.filter(
-                    event=event, veteran=veteran
-                ).first()
-                can_register = not existing_registration and event.is_registration_open()
-        except:
-            pass
+    if request.identity.is_veteran and request.identity.veteran_approved:
+        existing_registration = EventRegistration.objects.filter(
+            event=event, veteran_id=request.identity.veteran_member_id
+        ).first()
+        can_register = not existing_registration and event.is_registration_open()
     
     return render(request, 'veteran_app/event_detail.html', {
         'event': event,
@@ -2844,16 +2749,15 @@ def manage_events(request):
     
     # Get user's state if applicable
     user_state = None
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved:
-                messages.error(request, 'Your account is pending approval.')
-                return redirect('index')
-            user_state = user_state.state
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not identity.is_superuser:
+        if not identity.is_state_admin:
             messages.error(request, 'Access denied. Only state admins and superadmin can manage events.')
             return redirect('index')
+        if not identity.state_approved:
+            messages.error(request, 'Your account is pending approval.')
+            return redirect('index')
+        user_state = State.objects.get(id=identity.state_id)
     
     # Filter events based on user permissions
     if request.user.is_superuser:
@@ -2883,16 +2787,15 @@ def create_event(request):
     """Create new event - Superadmin and State Admins"""
     # Check permissions
     user_state = None
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved:
-                messages.error(request, 'Your account is pending approval.')
-                return redirect('index')
-            user_state = user_state.state
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not identity.is_superuser:
+        if not identity.is_state_admin:
             messages.error(request, 'Access denied. Only state admins and superadmin can create events.')
             return redirect('index')
+        if not identity.state_approved:
+            messages.error(request, 'Your account is pending approval.')
+            return redirect('index')
+        user_state = State.objects.get(id=identity.state_id)
     
     if request.method == 'POST':
         title = request.POST.get('title')
@@ -2981,21 +2884,20 @@ def edit_event(request, event_id):
     
     # Check permissions
     user_state = None
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved:
-                messages.error(request, 'Your account is pending approval.')
-                return redirect('index')
-            user_state = user_state.state
-            
-            # State admins can only edit events for their state or all-state events
-            if event.state and event.state != user_state:
-                messages.error(request, 'You can only edit events for your state.')
-                return redirect('manage_events')
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not identity.is_superuser:
+        if not identity.is_state_admin:
             messages.error(request, 'Access denied.')
             return redirect('index')
+        if not identity.state_approved:
+            messages.error(request, 'Your account is pending approval.')
+            return redirect('index')
+        
+        # State admins can only edit events for their state or all-state events
+        if event.state_id and event.state_id != identity.state_id:
+            messages.error(request, 'You can only edit events for your state.')
+            return redirect('manage_events')
+        user_state = State.objects.get(id=identity.state_id)
     
     if request.method == 'POST':
         event.title = request.POST.get('title')
@@ -3048,20 +2950,19 @@ def delete_event(request, event_id):
     event = get_object_or_404(Event, id=event_id)
     
     # Check permissions
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved:
-                messages.error(request, 'Your account is pending approval.')
-                return redirect('index')
-            
-            # State admins can only delete events for their state or all-state events
-            if event.state and event.state != user_state.state:
-                messages.error(request, 'You can only delete events for your state.')
-                return redirect('manage_events')
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not identity.is_superuser:
+        if not identity.is_state_admin:
             messages.error(request, 'Access denied.')
             return redirect('manage_events')
+        if not identity.state_approved:
+            messages.error(request, 'Your account is pending approval.')
+            return redirect('index')
+        
+        # State admins can only delete events for their state or all-state events
+        if event.state_id and event.state_id != identity.state_id:
+            messages.error(request, 'You can only delete events for your state.')
+            return redirect('manage_events')
     
     title = event.title
     event.delete()
@@ -3248,23 +3149,12 @@ def regenerate_backup_codes(request):
 def reports_builder(request):
     """Custom report builder"""
     # Allow superuser and accounts user
-    if not (request.user.is_superuser or request.user.username == 'accounts'):
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved:
-                messages.error(request, 'Access denied.')
-                return redirect('index')
-        except UserState.DoesNotExist:
+    identity = request.identity
+    if not (identity.is_superuser or request.user.username == 'accounts'):
+        if not identity.is_approved_state_admin:
             messages.error(request, 'Access denied.')
             return redirect('index')
     
-    user_state = None
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile.state
-        except:
-            pass
-    
     veteran_columns = [
         {'name': 'association_id', 'label': 'Association ID', 'type': 'text'},
         {'name': 'name', 'label': 'Name', 'type': 'text'},
@@ -3310,6 +3200,9 @@ def reports_builder(request):
     ]
     
     states = State.objects.all().order_by('name')
+    user_state = None
+    if not identity.is_superuser and identity.state_id:
+        user_state = next((state for state in states if state.id == identity.state_id), None)
     saved_configs = ReportConfiguration.objects.filter(
         django_models.Q(created_by=request.user) | django_models.Q(is_template=True)
     )
@@ -3318,111 +3211,98 @@ def reports_builder(request):
         'veteran_columns': veteran_columns,
         'states': states,
         'saved_configs': saved_configs,
-        'user_state': user_state
+        'user_state': user_state,
+        'export_formats': available_export_formats(),
+        'report_filter_fields': REPORT_FILTER_FIELDS
     })
 
 @login_required
 def generate_report(request):
-    """Generate and download report"""
+    """Queue a report export job and send the user to its progress page"""
     if request.method != 'POST':
         return redirect('reports_builder')
     
-    import csv
-    from datetime import datetime
-    
-    selected_columns = request.POST.getlist('columns')
-    if not selected_columns:
-        messages.error(request, 'Please select at least one column.')
+    try:
+        params = veteran_report_params(request.POST, request.user)
+    except ValidationError as e:
+        messages.error(request, e.messages[0])
         return redirect('reports_builder')
     
-    state_filter = request.POST.get('state_filter')
-    from_date = request.POST.get('from_date')
-    to_date = request.POST.get('to_date')
-    date_field = request.POST.get('date_field')
-    membership_filter = request.POST.get('membership_filter')
-    approval_filter = request.POST.get('approval_filter')
     export_format = request.POST.get('export_format', 'csv')
-    
-    # Validate dates don't exceed today
-    today = datetime.now().date()
-    if from_date:
-        from_date_obj = datetime.strptime(from_date, '%Y-%m-%d').date()
-        if from_date_obj > today:
-            messages.error(request, 'From Date cannot be a future date.')
-            return redirect('reports_builder')
-    if to_date:
-        to_date_obj = datetime.strptime(to_date, '%Y-%m-%d').date()
-        if to_date_obj > today:
-            messages.error(request, 'To Date cannot be a future date.')
-            return redirect('reports_builder')
-    if from_date and to_date and from_date > to_date:
-        messages.error(request, 'From Date cannot be later than To Date.')
+    if export_format not in dict(available_export_formats()):
+        messages.error(request, 'Unsupported export format.')
         return redirect('reports_builder')
     
-    queryset = VeteranMember.objects.all()
+    # Served from an earlier identical export when the data has not changed
+    job = enqueue_export(request.user, 'veteran', params, export_format)
     
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile.state
-            queryset = queryset.filter(state=user_state)
-        except:
-            pass
-    elif state_filter:
-        queryset = queryset.filter(state_id=state_filter)
-    
-    if from_date and to_date and date_field:
-        filter_kwargs = {f"{date_field}__range": [from_date, to_date]}
-        queryset = queryset.filter(**filter_kwargs)
-    
-    if membership_filter:
-        queryset = queryset.filter(membership=(membership_filter == 'true'))
-    
-    if approval_filter:
-        queryset = queryset.filter(approved=(approval_filter == 'true'))
-    
-    queryset = queryset.select_related('state', 'rank', 'branch', 'blood_group')
-    
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="veteran_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-    
-    writer = csv.writer(response)
-    headers = [col.replace('_', ' ').title() for col in selected_columns]
-    writer.writerow(headers)
-    
-    for member in queryset:
-        row = []
-        for col in selected_columns:
-            if col == 'state':
-                row.append(member.state.name)
-            elif col == 'rank':
-                row.append(member.rank.name)
-            elif col == 'branch':
-                row.append(member.branch.name)
-            elif col == 'blood_group':
-                row.append(member.blood_group.name)
-            elif col == 'medical_category':
-                row.append(member.medical_category.name if member.medical_category else member.medical_category_text or '')
-            elif col == 'nearest_echs':
-                row.append(member.nearest_echs.name if member.nearest_echs else member.nearest_echs_text or '')
-            elif col == 'nearest_dhq':
-                row.append(member.nearest_dhq_text or '')
-            elif col == 'membership':
-                row.append('Active' if member.membership else 'Inactive')
-            elif col == 'approved':
-                row.append('Approved' if member.approved else 'Pending')
-            else:
-                value = getattr(member, col, '')
-                row.append(value if value else '')
-        writer.writerow(row)
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({
+            'job_id': job.id,
+            'status_url': reverse('export_job_status', args=[job.id])
+        })
+    return redirect('export_job_detail', job_id=job.id)
+
+def _get_export_job(request, job_id):
+    """Export job visible to the current user (owner or superuser)"""
+    job = get_object_or_404(ExportJob, id=job_id)
+    if job.created_by_id != request.user.id and not request.user.is_superuser:
+        raise PermissionDenied
+    if job.status == ExportJob.STATUS_RUNNING and fail_stale_jobs(ExportJob):
+        # Its worker died; show the failure instead of polling forever
+        job.refresh_from_db()
+    return job
+
+@login_required
+def export_job_detail(request, job_id):
+    """Progress page for a queued report export"""
+    job = _get_export_job(request, job_id)
+    recent_jobs = ExportJob.objects.filter(created_by=request.user).exclude(id=job.id)[:10]
+    
+    return render(request, 'veteran_app/export_job_detail.html', {
+        'job': job,
+        'recent_jobs': recent_jobs
+    })
+
+@login_required
+@skip_global_announcements
+def export_job_status(request, job_id):
+    """JSON progress of a report export, polled by the progress page"""
+    job = _get_export_job(request, job_id)
     
-    return response
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'processed_rows': job.processed_rows,
+        'total_rows': job.total_rows,
+        'error': job.error,
+        'download_url': reverse('download_export', args=[job.id]) if job.is_downloadable else None,
+        'expires_at': job.expires_at.isoformat() if job.expires_at else None
+    })
+
+@login_required
+@skip_global_announcements
+def download_export(request, job_id):
+    """Download the file produced by a completed export job"""
+    job = _get_export_job(request, job_id)
+    
+    if not job.is_downloadable:
+        messages.error(request, 'This export is not available for download (not finished or expired).')
+        return redirect('export_job_detail', job_id=job.id)
+    
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=os.path.basename(job.file.name))
 
 @login_required
 def save_report_config(request):
     """Save report configuration"""
     if request.method == 'POST':
         name = request.POST.get('config_name')
-        selected_columns = request.POST.getlist('columns')
+        selected_columns = report_columns_from_post(request.POST)
+        
+        schedule = request.POST.get('schedule', '')
+        if schedule not in dict(ReportConfiguration._meta.get_field('schedule').choices):
+            schedule = ''
         
         if name and selected_columns:
             ReportConfiguration.objects.create(
@@ -3430,7 +3310,9 @@ def save_report_config(request):
                 description=request.POST.get('config_description', ''),
                 report_type='veteran',
                 selected_columns=selected_columns,
-                filters={},
+                filters=report_filters_from_post(request.POST),
+                schedule=schedule,
+                next_run_at=next_scheduled_run(schedule),
                 created_by=request.user
             )
             messages.success(request, f'Report configuration "{name}" saved!')
@@ -3440,6 +3322,7 @@ def save_report_config(request):
     return redirect('reports_builder')
 
 @login_required
+@skip_global_announcements
 def load_report_config(request, config_id):
     """Load saved report configuration"""
     config = get_object_or_404(ReportConfiguration, id=config_id)
@@ -3454,6 +3337,34 @@ def load_report_config(request, config_id):
         'filters': config.filters
     })
 
+@login_required
+def run_report_config(request, config_id):
+    """Queue an export of a saved report configuration"""
+    if request.method != 'POST':
+        return redirect('reports_builder')
+    
+    config = get_object_or_404(ReportConfiguration, id=config_id)
+    if not config.is_template and config.created_by != request.user:
+        messages.error(request, 'Access denied.')
+        return redirect('reports_builder')
+    if config.report_type != 'veteran':
+        messages.error(request, 'Only veteran reports can be run from the report builder.')
+        return redirect('reports_builder')
+    
+    data = report_config_form_data(config)
+    try:
+        params = veteran_report_params(data, request.user)
+    except ValidationError as e:
+        messages.error(request, e.messages[0])
+        return redirect('reports_builder')
+    
+    export_format = data.get('export_format', 'csv')
+    if export_format not in dict(available_export_formats()):
+        export_format = 'csv'
+    
+    job = enqueue_export(request.user, 'veteran', params, export_format, report_config=config)
+    return redirect('export_job_detail', job_id=job.id)
+
 # GALLERY VIEWS
 def gallery(request):
     """Public gallery view - accessible to everyone"""
@@ -3483,17 +3394,7 @@ def gallery(request):
             })
     
     # Check if user can upload
-    can_upload = False
-    if request.user.is_authenticated:
-        if request.user.is_superuser:
-            can_upload = True
-        else:
-            try:
-                user_state = request.user.state_profile
-                if user_state.approved:
-                    can_upload = True
-            except UserState.DoesNotExist:
-                pass
+    can_upload = request.identity.is_superuser or request.identity.is_approved_state_admin
     
     paginator = Paginator(images_list, 24)  # 24 per page (grid layout)
     page_number = request.GET.get('page')
@@ -3511,19 +3412,15 @@ def gallery(request):
 def upload_gallery_image(request):
     """Upload image to gallery - State admins and superuser only"""
     # Check permissions
-    if not request.user.is_superuser:
-        try:
-            user_state = request.user.state_profile
-            if not user_state.approved:
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                    return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
-                messages.error(request, 'Access denied.')
-                return redirect('gallery')
-        except UserState.DoesNotExist:
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-                return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+    identity = request.identity
+    if not identity.is_superuser and not identity.is_approved_state_admin:
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+        if identity.is_state_admin:
+            messages.error(request, 'Access denied.')
+        else:
             messages.error(request, 'Only state admins and superadmin can upload images.')
-            return redirect('gallery')
+        return redirect('gallery')
     
     if request.method == 'POST':
         title = request.POST.get('title', '').strip()
@@ -3542,12 +3439,8 @@ def upload_gallery_image(request):
                 )
                 
                 # Set state for state admins
-                if not request.user.is_superuser:
-                    try:
-                        user_state = request.user.state_profile
-                        gallery_image.state = user_state.state
-                    except UserState.DoesNotExist:
-                        pass
+                if not identity.is_superuser:
+                    gallery_image.state_id = identity.state_id
                 elif state_id:
                     gallery_image.state = State.objects.get(id=state_id)
                 
@@ -3737,7 +3630,7 @@ def association_id_card(request):
     # Generate association number if not exists
     if not veteran.association_number:
         veteran.generate_association_number()
-        veteran.save()
+        veteran.save(update_fields=['association_number', 'updated_at'])
     
     # Check if ID card is valid (not expired)
     is_valid = veteran.is_id_card_valid()
@@ -3771,6 +3664,7 @@ def association_id_card(request):
     })
 
 @login_required
+@skip_global_announcements
 def download_id_card(request):
     """Download Association ID Card as PDF in A4 format"""
     try:
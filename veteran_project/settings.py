@@ -55,6 +55,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'veteran_app.middleware.IdentityMiddleware',
     'veteran_app.middleware.UserStateMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -179,6 +180,8 @@ SECURE_SSL_REDIRECT = config('SECURE_SSL_REDIRECT', default=False, cast=bool)
 SECURE_HSTS_SECONDS = 31536000 if not DEBUG else 0
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
+# Path prefixes RequestValidationMiddleware does not scan for suspicious patterns
+REQUEST_VALIDATION_EXEMPT_PATHS = config('REQUEST_VALIDATION_EXEMPT_PATHS', default='/admin/', cast=Csv())
 
 # Session Security
 SESSION_COOKIE_SECURE = not DEBUG
@@ -186,6 +189,37 @@ SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Strict'
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_AGE = 3600  # 1 hour
+# last_seen/last_activity are rewritten at most this often (seconds); each
+# rewrite saves the session, which also extends its SESSION_COOKIE_AGE expiry
+SESSION_ACTIVITY_UPDATE_INTERVAL = config('SESSION_ACTIVITY_UPDATE_INTERVAL', default=300, cast=int)
+
+# Session storage (SESSION_BACKEND):
+#   db             - django_session table (default)
+#   cached_db      - 'sessions' cache in front of the table: reads come from the
+#                    cache, writes go to both. Existing sessions stay valid;
+#                    run `manage.py warm_session_cache` after switching.
+#   signed_cookies - no server-side storage. Sessions cannot be revoked on the
+#                    server (logout only clears the browser's cookie), and
+#                    switching logs everyone out once.
+# `manage.py benchmark_sessions` compares request latency across them.
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_BACKEND = config('SESSION_BACKEND', default='db')
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ValueError(f"SESSION_BACKEND must be one of: {', '.join(SESSION_ENGINES)}")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# request.identity (role, state, approval) is cached in the session and
+# re-resolved when a profile changes (version counters in the shared
+# 'sessions' cache) or after IDENTITY_SESSION_MAX_AGE seconds
+IDENTITY_CACHE_ALIAS = 'sessions'
+IDENTITY_SESSION_MAX_AGE = config('IDENTITY_SESSION_MAX_AGE', default=300, cast=int)
+# RBAC effective-permission sets (rbac_utils) and their versions
+RBAC_CACHE_ALIAS = 'sessions'
 
 # CSRF Security
 CSRF_COOKIE_SECURE = not DEBUG
@@ -208,6 +242,10 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': os.path.join(BASE_DIR, 'security.log'),
         },
+        'console': {
+            'level': 'INFO',
+            'class': 'logging.StreamHandler',
+        },
     },
     'loggers': {
         'veteran_app.middleware': {
@@ -215,6 +253,11 @@ LOGGING = {
             'level': 'WARNING',
             'propagate': True,
         },
+        'veteran_app.birthday_utils': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
@@ -223,9 +266,45 @@ CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'veteran-cache',
-    }
+    },
+    # Used by SESSION_BACKEND=cached_db, request.identity versions, RBAC
+    # permission sets, today's birthdays and the subscription due lists.
+    # Must be shared by all worker processes (a per-process cache would keep
+    # serving sessions another worker has logged out, or data another process
+    # has changed): files on the instance by default, or e.g.
+    # django.core.cache.backends.redis.RedisCache with a redis:// location.
+    'sessions': {
+        'BACKEND': config('SESSION_CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('SESSION_CACHE_LOCATION', default=os.path.join(BASE_DIR, 'session_cache')),
+        'TIMEOUT': SESSION_COOKIE_AGE,
+    },
 }
 
 
 
-# D:\Dev_drive\_veteran\veteran_cg\requirements.txt
\ No newline at end of file
+# D:\Dev_drive\_veteran\veteran_cg\requirements.txt
+# Birthday announcements: number of days (today included) shown on the home page
+UPCOMING_BIRTHDAYS_DAYS = config('UPCOMING_BIRTHDAYS_DAYS', default=7, cast=int)
+# Today's birthday list is cached until midnight in the shared cache
+BIRTHDAY_CACHE_ALIAS = 'sessions'
+# So are the Due Soon / Overdue subscription lists (refresh_subscription_due precomputes them nightly)
+SUBSCRIPTION_CACHE_ALIAS = 'sessions'
+
+# Birthday pipeline instrumentation (query counts/timings logged per request).
+# Off by default; superusers can also enable it per request with the X-Birthday-Debug header.
+BIRTHDAY_DEBUG = config('BIRTHDAY_DEBUG', default=False, cast=bool)
+BIRTHDAY_DEBUG_SAMPLE_RATE = config('BIRTHDAY_DEBUG_SAMPLE_RATE', default=1.0, cast=float)
+
+# Report builder exports and member imports run as background jobs
+# (veteran_app.ExportJob / veteran_app.ImportJob).
+# 'thread' builds queued jobs in a background thread of the web process (no
+# separate worker needed); 'worker' leaves them to `manage.py run_export_worker`.
+EXPORT_JOB_RUNNER = config('EXPORT_JOB_RUNNER', default='thread')
+# Generated files and uploaded import spreadsheets live outside MEDIA_ROOT
+# and are only served through the download views
+EXPORT_ROOT = config('EXPORT_ROOT', default=os.path.join(BASE_DIR, 'exports'))
+EXPORT_JOB_TTL_HOURS = config('EXPORT_JOB_TTL_HOURS', default=24, cast=int)
+# Running jobs without a progress write (heartbeat) for this long are marked failed (their process died)
+EXPORT_JOB_TIMEOUT_MINUTES = config('EXPORT_JOB_TIMEOUT_MINUTES', default=15, cast=int)
+# Local hour at which scheduled reports (ReportConfiguration.schedule) become due
+REPORT_SCHEDULE_HOUR = config('REPORT_SCHEDULE_HOUR', default=2, cast=int)